@@ -0,0 +1,229 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+import cv2
+from detection.detectors import DETECTORS
+from detection.encoding import batch_face_encodings
+from detection.face_detector import FaceRecognizer
+from detection.worker_pool import RecognitionPool, worker_recognizer
+import config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".flv", ".ts")
+CSV_FIELDS = ["source", "frame", "timestamp_ms", "top", "right", "bottom", "left", "name", "distance"]
+
+
+def expand_inputs(inputs):
+    """把命令行给出的文件、目录和通配符展开为 (视频列表, 图片列表)"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            paths.append(item)
+
+    videos = [p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS)]
+    images = [p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS)]
+    return videos, images
+
+
+def read_frames(sources, frame_step):
+    """依次产生 (来源, 帧号, 时间戳毫秒, BGR 帧)；图片的帧号为 0"""
+    for source in sources:
+        if source.lower().endswith(IMAGE_EXTENSIONS):
+            frame = cv2.imread(source)
+            if frame is None:
+                print(f"无法读取图片 {source}", file=sys.stderr)
+                continue
+            yield source, 0, None, frame
+            continue
+
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"无法打开视频 {source}", file=sys.stderr)
+            continue
+        index = 0
+        while True:
+            # 跳过的帧只 grab 不解码
+            if index % frame_step and cap.grab():
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield source, index, cap.get(cv2.CAP_PROP_POS_MSEC), frame
+            index += 1
+        cap.release()
+
+
+def process_sources(sources, batch_size, frame_step, face_recognizer=None):
+    """
+    识别一组来源，每比对完一批人脸产生一次 (这一批的检测记录, 上一批之后处理的帧数)，
+    长视频的结果边处理边输出，不必等整个视频处理完
+    """
+    face_recognizer = face_recognizer or worker_recognizer()
+    frame_count = 0
+    batch = []
+
+    def flush():
+        # 一批帧的人脸编码合并后一次性与人脸库比对
+        matches = face_recognizer.match_encodings([item[4] for item in batch])
+        rows = []
+        for (source, index, timestamp, location, _), (name, distance, _) in zip(batch, matches):
+            top, right, bottom, left = location
+            rows.append({
+                "source": source,
+                "frame": index,
+                "timestamp_ms": round(timestamp, 1) if timestamp is not None else None,
+                "top": top, "right": right, "bottom": bottom, "left": left,
+                "name": name,
+                "distance": round(distance, 4) if distance != float("inf") else None,
+            })
+        batch.clear()
+        return rows
+
+    for source, index, timestamp, frame in read_frames(sources, frame_step):
+        frame_count += 1
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = face_recognizer.detect_faces(rgb_frame)
+        encodings = batch_face_encodings(rgb_frame, locations)
+        for location, encoding in zip(locations, encodings):
+            batch.append((source, index, timestamp, location, encoding))
+        if len(batch) >= batch_size:
+            yield flush(), frame_count
+            frame_count = 0
+    if batch or frame_count:
+        yield flush(), frame_count
+
+
+def process_task(sources, batch_size, frame_step, results):
+    # 子进程中执行：每比对完一批就放入结果队列，由主进程边收边写
+    for rows, frame_count in process_sources(sources, batch_size, frame_step):
+        results.put((rows, frame_count))
+
+
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self.file = open(path, "w", encoding="utf-8", newline="") if path != "-" else sys.stdout
+        self.fmt = fmt
+        if fmt == "csv":
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.fmt == "csv":
+                self.csv_writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线批量人脸识别：处理视频文件和图片目录，输出每帧的检测与识别结果")
+    parser.add_argument("inputs", nargs="+", help="视频文件、图片目录或通配符（如 'archive/**/*.mp4'）")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，默认输出到标准输出")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="输出格式，默认按输出文件扩展名判断")
+    parser.add_argument("--known-faces", default=config.KNOWN_FACES_DIR, help="已知人脸目录")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default=config.DETECTOR_BACKEND, help="人脸检测后端")
+    parser.add_argument("--tolerance", type=float, default=config.TOLERANCE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行处理文件的进程数，0 表示在当前进程处理")
+    parser.add_argument("--batch-size", type=int, default=64, help="每批合并比对的人脸数")
+    parser.add_argument("--frame-step", type=int, default=1, help="视频每隔多少帧处理一帧")
+    parser.add_argument("--scale", type=float, default=config.DETECTION_SCALE if config.DETECTION_SCALE != "auto" else 1.0,
+                        help="检测缩放比例")
+    parser.add_argument("--images-per-task", type=int, default=256, help="图片按多少张一组分给进程")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    videos, images = expand_inputs(args.inputs)
+    if not videos and not images:
+        print("没有找到可处理的视频或图片。", file=sys.stderr)
+        return 1
+
+    # 每个视频一个任务，图片按组分配，避免任务过碎
+    tasks = [[video] for video in videos]
+    tasks += [images[i:i + args.images_per_task] for i in range(0, len(images), args.images_per_task)]
+
+    recognizer_kwargs = {
+        "tolerance": args.tolerance,
+        "matcher": config.MATCHER_BACKEND,
+        "matcher_params": config.MATCHER_PARAMS.get(config.MATCHER_BACKEND),
+        "index_path": config.MATCHER_INDEX_PATH,
+        "detector": args.detector,
+        "detector_params": config.DETECTOR_PARAMS.get(args.detector),
+        "detection_scale": args.scale,
+        "enrollment": config.ENROLLMENT,
+        "known_faces_dir": args.known_faces,
+    }
+    face_recognizer = FaceRecognizer(**recognizer_kwargs)
+
+    writer = ResultWriter(args.output, fmt)
+    start = time.perf_counter()
+    total_frames = 0
+    total_faces = 0
+
+    def write(rows, frame_count):
+        nonlocal total_frames, total_faces
+        writer.write(rows)
+        total_frames += frame_count
+        total_faces += len(rows)
+
+    try:
+        if args.workers > 0:
+            workers = min(args.workers, len(tasks))
+            pool = RecognitionPool(face_recognizer, workers)
+            # 子进程每批结果经队列送回；队列有上限，输出跟不上时子进程等待，内存不会随视频长度增长
+            manager = multiprocessing.get_context("spawn").Manager()
+            try:
+                results = manager.Queue(maxsize=workers * 4)
+                pending = {pool.submit_task(process_task, task, args.batch_size, args.frame_step, results)
+                           for task in tasks}
+                while pending:
+                    try:
+                        write(*results.get(timeout=0.1))
+                        continue
+                    except queue.Empty:
+                        pass
+                    # 队列空闲时检查结束的任务；结果按到达顺序写出，慢的文件不会挡住其他文件
+                    done, pending = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()  # 子进程出错时在这里抛出
+                # 最后几批可能在任务结束前刚放入队列
+                while not results.empty():
+                    write(*results.get())
+            finally:
+                manager.shutdown()
+                pool.close()
+        else:
+            for task in tasks:
+                for rows, frame_count in process_sources(task, args.batch_size, args.frame_step, face_recognizer):
+                    write(rows, frame_count)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"处理 {len(videos)} 个视频、{len(images)} 张图片，共 {total_frames} 帧，{total_faces} 张人脸，"
+          f"耗时 {elapsed:.1f} 秒，吞吐 {total_frames / elapsed if elapsed > 0 else 0:.1f} 帧/秒", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
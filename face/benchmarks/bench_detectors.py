@@ -0,0 +1,94 @@
+"""
+人脸检测后端对比：在同一组测试帧上比较各后端的延迟和召回率。
+在 face 目录下运行: python -m benchmarks.bench_detectors --output bench_detectors.json
+"""
+import argparse
+import cv2
+from benchmarks.common import measure, print_results, save_results, synthetic_frame
+from detection.detectors import DETECTORS, create_detector
+from detection.scaling import downscale, scale_locations
+import config
+
+
+def test_frames(args):
+    """不同人脸数量和大小的测试帧，返回 [(RGB 帧, 真实人脸位置列表), ...]"""
+    frames = []
+    for faces in range(1, args.max_faces + 1):
+        for face_height in args.face_heights:
+            frame, boxes = synthetic_frame(faces=faces, face_height=face_height, seed=faces, return_boxes=True)
+            frames.append((cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), boxes))
+    return frames
+
+
+def evaluate(locations, boxes):
+    """检测框中心落在贴图范围内即视为命中，每张贴图最多命中一次；返回 (命中数, 误检数)"""
+    hits = 0
+    false_positives = 0
+    remaining = list(boxes)
+    for top, right, bottom, left in locations:
+        cy, cx = (top + bottom) / 2, (left + right) / 2
+        for box in remaining:
+            if box[0] <= cy <= box[2] and box[3] <= cx <= box[1]:
+                remaining.remove(box)
+                hits += 1
+                break
+        else:
+            false_positives += 1
+    return hits, false_positives
+
+
+def bench_detector(backend, frames, args):
+    try:
+        detector = create_detector(backend, **config.DETECTOR_PARAMS.get(backend, {}))
+        # 部分后端（HOG）第一次检测时才导入依赖，先检测一帧，缺少依赖时同样跳过
+        detector.detect(frames[0][0])
+    except (FileNotFoundError, ImportError) as e:
+        print(f"跳过检测后端 {backend}: {e}")
+        return None
+
+    def detect_all():
+        return [scale_locations(detector.detect(downscale(rgb_frame, args.scale)), args.scale, rgb_frame.shape)
+                for rgb_frame, _ in frames]
+
+    hits = false_positives = total = 0
+    for locations, (_, boxes) in zip(detect_all(), frames):
+        frame_hits, frame_false_positives = evaluate(locations, boxes)
+        hits += frame_hits
+        false_positives += frame_false_positives
+        total += len(boxes)
+
+    result = {"stage": "detect", "backend": backend, "frames": len(frames), **measure(detect_all, args.repeats)}
+    # measure 测的是整组帧，换算为单帧延迟
+    for key in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"):
+        result[key] = round(result[key] / len(frames), 3)
+    result["per_second"] = round(result["per_second"] * len(frames), 2) if result["per_second"] else None
+    result["recall"] = round(hits / total, 3) if total else None
+    result["false_positives"] = false_positives
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="人脸检测后端延迟与召回率对比")
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=list(DETECTORS), help="检测后端，逗号分隔")
+    parser.add_argument("--max-faces", type=int, default=3, help="测试帧中最多的人脸数")
+    parser.add_argument("--face-heights", type=lambda s: [float(x) for x in s.split(",")], default=[0.7, 0.4, 0.2],
+                        help="人脸高度占画面的比例，逗号分隔")
+    parser.add_argument("--scale", type=float, default=1.0, help="检测缩放比例")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="bench_detectors.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    frames = test_frames(args)
+    results = [result for result in (bench_detector(backend, frames, args) for backend in args.backends) if result]
+    print_results(results, args.baseline)
+    for result in results:
+        print(f"{result['backend']:<10} 召回率 {result['recall']:.1%}  误检 {result['false_positives']}")
+    save_results(args.output, "detectors", results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+量化人脸库的精度漂移与速度：以 float64 精确暴力搜索为基准，比较 float32 / float16 / uint8 的
+top-1 一致率、距离误差、阈值判断翻转率、延迟和常驻内存（人脸库矩阵、压缩编码和重排编码合计）。
+在 face 目录下运行: python -m benchmarks.bench_quantization --output bench_quantization.json
+"""
+import argparse
+import os
+import numpy as np
+from benchmarks.common import measure, print_results, save_results
+from detection.gallery import FaceGallery
+from detection.matchers import create_matcher
+import config
+
+
+def synthetic_encodings(size, queries, dim=128, seed=0):
+    """
+    生成与 dlib 编码统计特征相近的人脸库（各维约为 N(0, 0.09)，范数约为 1），
+    一半查询是库中人员加上同一人不同照片量级的扰动，另一半是库外人员
+    """
+    rng = np.random.default_rng(seed)
+    gallery = rng.normal(0, 0.09, (size, dim))
+    genuine = gallery[rng.integers(0, size, queries // 2)] + rng.normal(0, 0.025, (queries // 2, dim))
+    impostor = rng.normal(0, 0.09, (queries - queries // 2, dim))
+    return gallery, np.vstack([genuine, impostor])
+
+
+def exact_search(gallery, queries):
+    """float64 精确暴力搜索，作为基准"""
+    sq = (gallery ** 2).sum(axis=1)[None, :] - 2.0 * queries @ gallery.T + (queries ** 2).sum(axis=1)[:, None]
+    best = np.argmin(sq, axis=1)
+    return best, np.sqrt(np.maximum(sq[np.arange(len(queries)), best], 0.0))
+
+
+def drift(reference, indices, distances, tolerance):
+    ref_indices, ref_distances = reference
+    return {
+        "top1_agreement": round(float(np.mean(indices == ref_indices)), 5),
+        "max_distance_error": round(float(np.abs(distances - ref_distances).max()), 6),
+        "decision_flips": int(np.sum((distances <= tolerance) != (ref_distances <= tolerance))),
+    }
+
+
+def build_gallery(data):
+    gallery = FaceGallery(capacity=len(data))
+    for i, encoding in enumerate(data):
+        gallery.add(f"person_{i}", "", encoding)
+    return gallery
+
+
+def resident_mb(gallery, matcher):
+    """
+    人脸库矩阵和匹配后端各数组合计占用的内存，同一个数组只算一次。
+    压缩编码每次查询都全部扫描，内存映射时也计入；内存映射的重排编码只读入被访问的行，不计
+    """
+    codes = getattr(matcher, "codes", None)
+    arrays = [gallery.encodings, gallery.sq_norms, codes, getattr(matcher, "code_norms", None)]
+    arrays = [array for array in arrays if array is not None and not (isinstance(array, np.memmap) and array is not codes)]
+    unique = {id(array): array for array in arrays}
+    return round(sum(array.nbytes for array in unique.values()) / (1 << 20), 2)
+
+
+def bench_size(size, args):
+    results = []
+    data, queries = synthetic_encodings(size, args.queries)
+    reference = exact_search(data, queries)
+
+    gallery = build_gallery(data)
+    brute = create_matcher("brute", gallery)
+    indices, distances = brute.search(queries, k=1)
+    results.append({"stage": "match", "backend": "float32", "gallery_size": size,
+                    "gallery_mb": resident_mb(gallery, brute),
+                    **drift(reference, indices[:, 0], distances[:, 0], args.tolerance),
+                    **measure(lambda: brute.search(queries, k=1), args.repeats)})
+
+    for dtype in args.dtypes:
+        for rerank in args.rerank:
+            # 量化后端会把人脸库的 float32 矩阵换成 float16，每种配置用一个新的人脸库
+            gallery = build_gallery(data)
+            index_path = os.path.join(args.index_dir, f"quantized_{size}_{dtype}.idx") if args.index_dir else None
+            matcher = create_matcher("quantized", gallery, index_path=index_path, dtype=dtype, rerank=rerank)
+            # rerank=1 时不做候选扩充，直接看压缩数据本身的误差
+            candidates, approx = matcher.approximate(queries.astype(np.float32), 1)
+            raw = drift(reference, candidates[:, 0], np.sqrt(np.maximum(approx[:, 0], 0.0)), args.tolerance)
+            indices, distances = matcher.search(queries, k=1)
+            backend = f"{dtype}+rerank{rerank}" + ("+mmap" if index_path else "")
+            results.append({"stage": "match", "backend": backend, "gallery_size": size,
+                            "gallery_mb": resident_mb(gallery, matcher),
+                            "approx_top1_agreement": raw["top1_agreement"],
+                            "approx_max_distance_error": raw["max_distance_error"],
+                            **drift(reference, indices[:, 0], distances[:, 0], args.tolerance),
+                            **measure(lambda: matcher.search(queries, k=1), args.repeats)})
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="量化人脸库精度漂移与速度测试")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10000, 100000],
+                        help="人脸库规模，逗号分隔")
+    parser.add_argument("--dtypes", type=lambda s: s.split(","), default=["float16", "uint8"])
+    parser.add_argument("--rerank", type=lambda s: [int(x) for x in s.split(",")], default=[8, 32],
+                        help="精确重排的候选数量，逗号分隔")
+    parser.add_argument("--queries", type=int, default=64, help="查询人脸数（一半为库中人员）")
+    parser.add_argument("--index-dir", help="量化索引保存目录；给出时索引内存映射读取，重排编码不常驻内存")
+    parser.add_argument("--tolerance", type=float, default=config.TOLERANCE)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", default="bench_quantization.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for size in args.sizes:
+        results += bench_size(size, args)
+    print_results(results, args.baseline)
+    for result in results:
+        print(f"{result['backend']:<24} 规模 {result['gallery_size']:>8}  内存 {result['gallery_mb']:>8.2f} MB  "
+              f"top-1 一致率 {result['top1_agreement']:.4f}  最大距离误差 {result['max_distance_error']:.6f}  "
+              f"阈值判断翻转 {result['decision_flips']}")
+    save_results(args.output, "quantization", results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+识别热路径基准测试，不需要摄像头和 GPU。
+在 face 目录下运行: python -m benchmarks.bench_recognition --output bench.json
+"""
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import cv2
+import face_recognition
+import numpy as np
+from benchmarks.common import (KNOWN_FACES_DIR, bundled_faces, measure, print_results, save_results,
+                               synthetic_frame, tiled_gallery)
+from detection.encoding import batch_face_encodings
+from detection.face_detector import FaceRecognizer
+from detection.matchers import create_matcher
+from utils.image_enhancement import enhance_image
+import config
+
+
+def bench_load_known_faces(args):
+    results = []
+    work_dir = tempfile.mkdtemp()
+    try:
+        faces_dir = os.path.join(work_dir, "known_faces")
+        shutil.copytree(KNOWN_FACES_DIR, faces_dir)
+        cache_path = os.path.join(work_dir, "cache.npz")
+
+        def cold():
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            FaceRecognizer(known_faces_dir=faces_dir, cache_path=cache_path)
+
+        def warm():
+            FaceRecognizer(known_faces_dir=faces_dir, cache_path=cache_path)
+
+        repeats = max(args.repeats // 10, 3)
+        results.append({"stage": "load_known_faces_cold", "gallery_size": len(bundled_faces()),
+                        **measure(cold, repeats=repeats, warmup=1)})
+        warm()
+        results.append({"stage": "load_known_faces_warm", "gallery_size": len(bundled_faces()),
+                        **measure(warm, repeats=repeats, warmup=1)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def base_encodings():
+    encodings = []
+    for name, image in bundled_faces():
+        found = face_recognition.face_encodings(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if found:
+            encodings.append(found[0])
+    return encodings
+
+
+def bench_recognition(args, encodings):
+    results = []
+    frame = synthetic_frame(faces=args.faces)
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    for size in args.sizes:
+        gallery = tiled_gallery(encodings, size)
+        recognizer = FaceRecognizer(gallery=gallery, detection_scale=args.scale)
+        if size == args.sizes[0]:
+            results.append({"stage": "detect_faces", **measure(lambda: recognizer.detect_faces(rgb_frame), args.repeats)})
+            locations = recognizer.detect_faces(rgb_frame)
+            results.append({"stage": "face_encodings",
+                            **measure(lambda: face_recognition.face_encodings(rgb_frame, locations), args.repeats)})
+            results.append({"stage": "batch_face_encodings", "faces": len(locations),
+                            **measure(lambda: batch_face_encodings(rgb_frame, locations), args.repeats)})
+            results.append(bench_memo(gallery, rgb_frame, locations, args))
+
+        results.append({"stage": "recognize_faces", "gallery_size": size,
+                        **measure(lambda: recognizer.recognize_faces(frame.copy()), args.repeats)})
+
+        queries = encodings[:1] * args.faces
+        for backend in args.backends:
+            matcher = create_matcher(backend, gallery)
+            results.append({"stage": "match", "backend": backend, "gallery_size": size,
+                            **measure(lambda: matcher.search(queries, k=1), args.repeats * 4)})
+    return results
+
+
+def bench_memo(gallery, rgb_frame, locations, args):
+    # 模拟人站着不动：同一画面加入少量传感器噪声，比较编码备忘的耗时和命中率
+    rng = np.random.default_rng(0)
+    frames = [np.clip(rgb_frame + rng.normal(0, args.memo_noise, rgb_frame.shape), 0, 255).astype(np.uint8)
+              for _ in range(8)]
+    recognizer = FaceRecognizer(gallery=gallery, encoding_memo=config.ENCODING_MEMO or {})
+    noisy = itertools.cycle(frames)
+    result = {"stage": "match_faces_memo", "faces": len(locations),
+              **measure(lambda: recognizer.match_faces(next(noisy), locations), args.repeats)}
+    result.update(recognizer.encoding_memo.stats())
+    print(f"编码备忘命中率 {result['hit_rate']:.1%}，约节省 {result['saved_ms']:.0f} ms")
+    return result
+
+
+def bench_display(args):
+    results = []
+    frame = synthetic_frame(faces=args.faces)
+    results.append({"stage": "enhance_image", **measure(lambda: enhance_image(frame), args.repeats)})
+
+    try:
+        from PyQt5.QtGui import QImage
+    except ImportError:
+        print("未安装 PyQt5，跳过 QImage 转换测试。")
+        return results
+
+    def to_qimage():
+        # 与 VideoCaptureThread.run 中的转换一致
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb_frame.shape
+        return QImage(rgb_frame.data, w, h, ch * w, QImage.Format_RGB888).copy()
+
+    results.append({"stage": "qimage_conversion", **measure(to_qimage, args.repeats)})
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="人脸识别热路径基准测试")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 1000, 100000],
+                        help="人脸库规模，逗号分隔")
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=["brute"], help="匹配后端，逗号分隔")
+    parser.add_argument("--faces", type=int, default=1, help="测试帧中的人脸数")
+    parser.add_argument("--scale", type=float, default=1.0, help="检测缩放比例")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--memo-noise", type=float, default=2.0, help="编码备忘测试中加入的像素噪声标准差")
+    parser.add_argument("--output", default="bench_recognition.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = bench_load_known_faces(args)
+    results += bench_recognition(args, base_encodings())
+    results += bench_display(args)
+    print_results(results, args.baseline)
+    save_results(args.output, "recognition", results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+推理调度器基准测试：多个提交方并发识别人脸截图，比较逐个直接识别与攒批识别的吞吐和延迟。
+每个提交方提交一张、等到结果后再提交下一张（类似各路摄像头），批大小最多等于提交方数。
+在 face 目录下运行: python -m benchmarks.bench_scheduler --output bench_scheduler.json
+"""
+import argparse
+import threading
+import time
+import cv2
+import numpy as np
+from benchmarks.common import KNOWN_FACES_DIR, bundled_faces, peak_rss_mb, print_results, reset_peak_rss, save_results
+from detection.face_detector import FaceRecognizer
+from detection.scheduler import BatchScheduler
+import config
+
+
+def run_producers(producers, requests, crops, identify):
+    """启动 producers 个提交方各识别 requests 张截图，返回每个请求的耗时（秒）、总耗时和期间的峰值 RSS（MB）"""
+    latencies = [[] for _ in range(producers)]
+
+    def produce(index):
+        for i in range(requests):
+            crop = crops[(index + i) % len(crops)]
+            start = time.perf_counter()
+            identify(crop)
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=produce, args=(index,)) for index in range(producers)]
+    reset_peak_rss()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return np.concatenate(latencies), elapsed, peak_rss_mb()
+
+
+def summarize(backend, latencies, elapsed, peak, producers):
+    latencies_ms = latencies * 1000
+    return {
+        "stage": "schedule",
+        "backend": backend,
+        "producers": producers,
+        "runs": len(latencies),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+        "per_second": round(len(latencies) / elapsed, 2),
+        "peak_rss_mb": round(peak, 3) if peak is not None else None,
+    }
+
+
+def bench_direct(recognizer, crops, args):
+    # 各提交方直接调用识别器，每次只编码和比对一张人脸
+    def identify(crop):
+        height, width = crop.shape[:2]
+        return recognizer.match_faces(crop, [(0, width, height, 0)])
+
+    latencies, elapsed, peak = run_producers(args.producers, args.requests, crops, identify)
+    return summarize("direct", latencies, elapsed, peak, args.producers)
+
+
+def bench_batched(recognizer, crops, args, max_batch_size):
+    scheduler = BatchScheduler(recognizer, max_batch_size=max_batch_size, max_wait_ms=args.max_wait_ms,
+                               max_queue=config.INFERENCE_SCHEDULER["max_queue"])
+    scheduler.start()
+    try:
+        latencies, elapsed, peak = run_producers(args.producers, args.requests, crops, scheduler.identify)
+    finally:
+        scheduler.stop()
+        scheduler.join()
+    result = summarize(f"batch={max_batch_size}", latencies, elapsed, peak, args.producers)
+    stats = scheduler.stats()
+    result["mean_batch_size"] = stats["mean_batch_size"]
+    result["batch_size_histogram"] = stats["batch_size_histogram"]
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="推理调度器攒批效果")
+    parser.add_argument("--producers", type=int, default=8, help="并发提交方数量")
+    parser.add_argument("--requests", type=int, default=50, help="每个提交方的请求数")
+    parser.add_argument("--batch-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16],
+                        help="最大批大小，逗号分隔")
+    parser.add_argument("--max-wait-ms", type=float, default=config.INFERENCE_SCHEDULER["max_wait_ms"])
+    parser.add_argument("--output", default="bench_scheduler.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    recognizer = FaceRecognizer(known_faces_dir=KNOWN_FACES_DIR)
+    crops = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for _, image in bundled_faces()]
+    results = [bench_direct(recognizer, crops, args)]
+    results += [bench_batched(recognizer, crops, args, max_batch_size) for max_batch_size in args.batch_sizes]
+    print_results(results, args.baseline)
+    for result in results[1:]:
+        print(f"{result['backend']:<10} 平均批大小 {result['mean_batch_size']}  分布 {result['batch_size_histogram']}")
+    save_results(args.output, "scheduler", results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+识别服务压测：多个持久连接并发请求本机的识别服务，统计每秒请求数和尾延迟。
+先启动服务（python -m service.server），或加 --start-server 由压测脚本在子进程中启动。
+在 face 目录下运行: python -m benchmarks.bench_service --connections 8 --requests 100 --output bench_service.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+from benchmarks.common import FACE_DIR, bundled_faces, peak_rss_mb, print_results, save_results, synthetic_frame
+from service.client import RecognitionClient
+import config
+
+
+def test_images(args):
+    """压测用的 JPEG 图片：自带的人脸图片和合成的多人画面"""
+    images = [image for _, image in bundled_faces()]
+    images += [synthetic_frame(faces=faces, seed=faces) for faces in range(1, args.max_faces + 1)]
+    return [cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for image in images]
+
+
+async def identify_worker(index, args, images, latencies, errors):
+    async with RecognitionClient(args.host, args.port) as client:
+        for i in range(args.requests):
+            start = time.perf_counter()
+            status, _ = await client.identify(images[(index + i) % len(images)])
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+
+async def stream_worker(index, args, images, latencies, errors):
+    # 一个连接上发送一条流；帧逐个发出，收到上一帧结果后再发下一帧，测的是单帧往返延迟
+    async with RecognitionClient(args.host, args.port) as client:
+        frames = asyncio.Queue()
+        sent = []
+
+        async def frame_source():
+            for _ in range(args.requests):
+                frame = await frames.get()
+                sent.append(time.perf_counter())
+                yield frame
+
+        await frames.put(images[index % len(images)])
+        received = 0
+        async for result in client.stream(frame_source()):
+            latencies.append(time.perf_counter() - sent[received])
+            if "error" in result:
+                errors["frame"] = errors.get("frame", 0) + 1
+            received += 1
+            if received < args.requests:
+                await frames.put(images[(index + received) % len(images)])
+
+
+async def run_load(args, images):
+    latencies = []
+    errors = {}
+    worker = stream_worker if args.mode == "stream" else identify_worker
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index, args, images, latencies, errors) for index in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    async with RecognitionClient(args.host, args.port) as client:
+        _, stats = await client.stats()
+    return np.array(latencies), elapsed, errors, stats
+
+
+def wait_for_server(args, timeout=60):
+    async def ping():
+        async with RecognitionClient(args.host, args.port) as client:
+            return (await client.request("GET", "/health"))[0] == 200
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if asyncio.run(ping()):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"识别服务 {args.host}:{args.port} 在 {timeout} 秒内没有启动")
+
+
+def server_peak_rss_mb(server):
+    """服务进程和各检测子进程的峰值 RSS 之和（MB）；子进程列表只在 Linux 上能读到，都读不到时返回 None"""
+    pids = [server.pid]
+    try:
+        with open(f"/proc/{server.pid}/task/{server.pid}/children", "r") as f:
+            pids += [int(pid) for pid in f.read().split()]
+    except OSError:
+        pass
+    peaks = [peak for peak in (peak_rss_mb(pid) for pid in pids) if peak is not None]
+    return sum(peaks) if peaks else None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="识别服务压测")
+    parser.add_argument("--host", default=config.SERVICE["host"])
+    parser.add_argument("--port", type=int, default=config.SERVICE["port"])
+    parser.add_argument("--mode", choices=["identify", "stream"], default="identify",
+                        help="identify: 每个请求一张图片；stream: 每个连接一条流")
+    parser.add_argument("--connections", type=int, default=8, help="并发连接数")
+    parser.add_argument("--requests", type=int, default=100, help="每个连接的请求数（流模式为帧数）")
+    parser.add_argument("--max-faces", type=int, default=3, help="合成画面中最多的人脸数")
+    parser.add_argument("--start-server", action="store_true", help="在子进程中启动识别服务，压测结束后关闭")
+    parser.add_argument("--output", default="bench_service.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    peak = None  # 只有由本脚本启动服务时才能读到服务端的峰值 RSS
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, "-m", "service.server", "--host", args.host,
+                                   "--port", str(args.port)], cwd=FACE_DIR, env=dict(os.environ))
+    try:
+        wait_for_server(args)
+        images = test_images(args)
+        latencies, elapsed, errors, stats = asyncio.run(run_load(args, images))
+    finally:
+        if server is not None:
+            peak = server_peak_rss_mb(server)
+            server.terminate()
+            server.wait()
+
+    if not len(latencies):
+        print(f"没有成功的请求，错误: {errors}")
+        return
+    latencies_ms = latencies * 1000
+    result = {
+        "stage": f"service_{args.mode}",
+        "backend": f"connections={args.connections}",
+        "runs": len(latencies),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+        "per_second": round(len(latencies) / elapsed, 2),
+        "peak_rss_mb": round(peak, 3) if peak is not None else None,
+        "errors": errors,
+        "server_scheduler": stats.get("scheduler"),
+    }
+    print_results([result], args.baseline)
+    print(f"每秒请求数 {result['per_second']}  p99 {result['p99_ms']} ms  错误 {errors or '无'}")
+    scheduler = stats.get("scheduler") or {}
+    print(f"服务端平均批大小 {scheduler.get('mean_batch_size')}  分布 {scheduler.get('batch_size_histogram')}")
+    save_results(args.output, "service", [result], args)
+
+
+if __name__ == "__main__":
+    main()
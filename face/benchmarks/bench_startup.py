@@ -0,0 +1,58 @@
+"""
+冷启动导入耗时：每次启动一个新的 Python 进程导入指定模块，测量进程启动 + 导入的总耗时。
+界面启动链路（ui.main_window）不应导入 face_recognition / dlib，它们在后台加载人脸库时才导入。
+在 face 目录下运行: python -m benchmarks.bench_startup --output bench_startup.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+from benchmarks.common import FACE_DIR, measure, print_results, save_results
+
+DEFAULT_MODULES = ["utils.startup", "cv2", "PyQt5.QtWidgets", "detection.face_detector", "ui.main_window",
+                   "face_recognition"]
+
+
+def import_command(module):
+    # 导入后检查是否顺带导入了 face_recognition，用于确认界面启动链路没有提前加载模型
+    return [sys.executable, "-c",
+            f"import sys, {module}; print('face_recognition' in sys.modules)"]
+
+
+def bench_module(module, args):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    probe = subprocess.run(import_command(module), cwd=FACE_DIR, env=env, capture_output=True, text=True)
+    if probe.returncode != 0:
+        print(f"跳过 {module}: {probe.stderr.strip().splitlines()[-1] if probe.stderr.strip() else '导入失败'}")
+        return None
+
+    def run():
+        subprocess.run(import_command(module), cwd=FACE_DIR, env=env, capture_output=True, check=True)
+
+    result = {"stage": "import", "backend": module, **measure(run, args.repeats, warmup=1)}
+    result["loads_face_recognition"] = probe.stdout.strip() == "True"
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动导入耗时")
+    parser.add_argument("--modules", type=lambda s: s.split(","), default=DEFAULT_MODULES, help="模块，逗号分隔")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="bench_startup.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于对比的旧结果 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 空进程的启动耗时作为参照
+    results = [result for result in (bench_module(module, args) for module in ["sys"] + args.modules) if result]
+    print_results(results, args.baseline)
+    for result in results:
+        if result["loads_face_recognition"] and result["backend"] != "face_recognition":
+            print(f"注意: 导入 {result['backend']} 时加载了 face_recognition")
+    save_results(args.output, "startup", results, args)
+
+
+if __name__ == "__main__":
+    main()
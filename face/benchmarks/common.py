@@ -0,0 +1,178 @@
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+
+FACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KNOWN_FACES_DIR = os.path.join(FACE_DIR, "known_faces")
+
+
+def reset_peak_rss():
+    """把本进程的峰值 RSS 重置为当前值（Linux 写 /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb(pid=None):
+    """
+    进程的峰值常驻内存（MB），包含 dlib、OpenCV 等原生库的分配；pid 为 None 表示本进程。
+    Linux 读 /proc 中的 VmHWM，其他平台用 resource（只限本进程）或 psutil，都不可用时返回 None
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is None:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # macOS 上单位是字节，Linux 上是 KB
+            return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+        except ImportError:
+            pass  # Windows
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        info = psutil.Process(pid).memory_info()
+    except psutil.Error:
+        return None
+    # Windows 上有峰值工作集，其他平台只能取当前 RSS
+    return getattr(info, "peak_wset", info.rss) / (1 << 20)
+
+
+def measure(fn, repeats=50, warmup=3):
+    """
+    重复执行 fn，返回延迟分位数（毫秒）、吞吐（次/秒）和峰值 RSS（MB）。
+    能重置峰值时为执行期间的进程峰值，否则为进程启动以来的峰值
+    """
+    for _ in range(warmup):
+        fn()
+
+    # 预热后重置峰值，计时期间的原生内存分配都计入
+    reset_peak_rss()
+    times = np.zeros(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - start
+    peak = peak_rss_mb()
+
+    times_ms = times * 1000
+    return {
+        "runs": repeats,
+        "mean_ms": round(float(times_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(times_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(times_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(times_ms, 99)), 3),
+        "max_ms": round(float(times_ms.max()), 3),
+        "per_second": round(float(repeats / times.sum()), 2) if times.sum() > 0 else None,
+        "peak_rss_mb": round(peak, 3) if peak is not None else None,
+    }
+
+
+def bundled_faces():
+    """读取自带的 known_faces 图片（BGR）"""
+    images = []
+    for filename in sorted(os.listdir(KNOWN_FACES_DIR)):
+        if filename.endswith(".jpg") or filename.endswith(".png"):
+            images.append((os.path.splitext(filename)[0], cv2.imread(os.path.join(KNOWN_FACES_DIR, filename))))
+    return images
+
+
+def synthetic_frame(width=900, height=500, faces=1, seed=0, face_height=0.7, return_boxes=False):
+    """
+    生成与摄像头画面同尺寸的测试帧：噪声背景上贴入自带的人脸图片。
+    return_boxes 为 True 时同时返回每张贴图的位置 (top, right, bottom, left)，用于计算检测召回率
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    images = [image for _, image in bundled_faces()]
+    slot_w = width // max(faces, 1)
+    boxes = []
+    for i in range(faces):
+        image = images[i % len(images)]
+        face_h = int(height * face_height)
+        face_w = min(int(image.shape[1] * face_h / image.shape[0]), slot_w)
+        face_h = int(image.shape[0] * face_w / image.shape[1])
+        resized = cv2.resize(image, (face_w, face_h), interpolation=cv2.INTER_AREA)
+        top = (height - face_h) // 2
+        left = i * slot_w + (slot_w - face_w) // 2
+        frame[top:top + face_h, left:left + face_w] = resized
+        boxes.append((top, left + face_w, top + face_h, left))
+    return (frame, boxes) if return_boxes else frame
+
+
+def tiled_gallery(base_encodings, size, noise=0.02, seed=0):
+    """把少量真实编码平铺并加入微小扰动，得到指定规模的人脸库"""
+    from detection.gallery import FaceGallery
+
+    rng = np.random.default_rng(seed)
+    base = np.asarray(base_encodings, dtype=np.float32)
+    gallery = FaceGallery(capacity=size)
+    encodings = base[np.arange(size) % len(base)] + rng.normal(0, noise, (size, base.shape[1])).astype(np.float32)
+    for i, encoding in enumerate(encodings):
+        gallery.add(f"person_{i}", "", encoding)
+    return gallery
+
+
+def environment():
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def save_results(path, name, results, args):
+    report = {"benchmark": name, "environment": environment(), "args": vars(args), "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {path}")
+
+
+def print_results(results, baseline_path=None):
+    """打印结果表格；给出基线文件时同时显示 p50 变化"""
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = {result_key(r): r for r in json.load(f)["results"]}
+
+    for result in results:
+        line = (f"{result_key(result):<40} p50 {result['p50_ms']:>10.3f} ms  p90 {result['p90_ms']:>10.3f} ms  "
+                f"p99 {result['p99_ms']:>10.3f} ms  {result['per_second'] or 0:>10.1f}/s  "
+                f"峰值 RSS {format_mb(result.get('peak_rss_mb'))}")
+        old = baseline.get(result_key(result))
+        if old:
+            # 基线中极快的阶段四舍五入后可能为 0
+            ratio = result["p50_ms"] / old["p50_ms"] if old.get("p50_ms") else None
+            line += f"  相对基线 {ratio:.2f}x" if ratio is not None else "  相对基线 n/a"
+        print(line)
+
+
+def format_mb(value):
+    return f"{value:>8.1f} MB" if value is not None else f"{'-':>8} MB"
+
+
+def result_key(result):
+    parts = [result["stage"]]
+    for key in ("backend", "gallery_size"):
+        if key in result:
+            parts.append(f"{key}={result[key]}")
+    return " ".join(parts)
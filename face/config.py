@@ -0,0 +1,135 @@
+# 全局配置
+import os
+
+# 数据根目录：已知人脸、人员信息、到访记录等都放在这里，可用环境变量 FACE_DATA_ROOT 指定，默认为本目录
+DATA_ROOT = os.environ.get("FACE_DATA_ROOT", os.path.dirname(os.path.abspath(__file__)))
+KNOWN_FACES_DIR = os.path.join(DATA_ROOT, "known_faces")
+# 人员信息：information.txt 为逗号分隔的原始文件（姓名,性别,学号,学院,人员类型,入学时间），
+# 启动和文件变化时导入到 SQLite 人员信息库，识别时按姓名查询
+INFO_PATH = os.path.join(DATA_ROOT, "information", "information.txt")
+PERSON_DB_PATH = os.path.join(DATA_ROOT, "information", "persons.db")
+PERSON_CACHE_SIZE = 256  # 格式化后的人员信息缓存条数
+
+# 识别阈值，距离小于等于该值视为同一人
+TOLERANCE = 0.45
+
+# 人脸库匹配后端:
+#   "brute" 精确暴力搜索，适合几千人以内
+#   "ivf"   纯 NumPy 的 k-means 倒排索引，n_probe 越大召回率越高、速度越慢
+#   "hnsw"  分层图索引（需要 pip install hnswlib），ef 越大召回率越高、速度越慢
+#   "quantized" 压缩人脸库：编码存为 float16 或 uint8（8 位无符号整数，约为原来的 1/4），近似距离选出 rerank 个候选后
+#               用 float16 编码精确重排，适合几十万人的大库；索引文件内存映射读取，float32 人脸库矩阵不再常驻内存
+MATCHER_BACKEND = "brute"
+MATCHER_PARAMS = {
+    "brute": {},
+    "ivf": {"n_lists": None, "n_probe": 8},
+    "hnsw": {"m": 16, "ef_construction": 200, "ef": 64},
+    "quantized": {"dtype": "uint8", "rerank": 32},
+}
+# 索引文件路径，None 表示保存在 known_faces 目录下
+MATCHER_INDEX_PATH = None
+
+# 人脸登记：known_faces 下每人可以是一张 {姓名}.jpg，也可以是一个 {姓名}/ 子目录放多张图片
+# 每张图片需要恰好一张人脸、人脸短边不小于 min_face_size 像素、人脸区域清晰度（拉普拉斯方差）不低于 min_sharpness
+# templates: "centroid" 每人一个平均模板；"medoids" 每人最多 max_templates 个代表样本，适合不同角度/发型的照片
+# 多样本模板比单张照片稳定，可以适当调小 TOLERANCE
+ENROLLMENT = {
+    "min_sharpness": 50.0,
+    "min_face_size": 60,
+    "templates": "centroid",
+    "max_templates": 3,
+}
+
+# 人脸检测后端:
+#   "hog"     dlib HOG（face_recognition 默认），准确但最慢
+#   "cascade" OpenCV 自带的 Haar/LBP 级联分类器，快很多，侧脸和暗光下漏检更多
+#   "dnn"     OpenCV DNN 的 ResNet-10 SSD，需要把 deploy.prototxt 和 res10_300x300_ssd_iter_140000.caffemodel 放到 models 目录
+DETECTOR_BACKEND = "hog"
+DETECTOR_PARAMS = {
+    "hog": {"upsample": 1},
+    "cascade": {"cascade": "haarcascade_frontalface_default.xml", "scale_factor": 1.1, "min_neighbors": 5},
+    "dnn": {"confidence": 0.5},
+}
+
+# 视频源列表：摄像头编号、RTSP/HTTP 地址或视频文件路径，也可以写成
+# {"source": ..., "name": "东门", "fps": 5}，fps 为该路每秒最多识别的帧数（None 表示不限）
+# 多路视频共用一个识别引擎和人脸库，界面以网格显示
+CAMERA_SOURCES = [0]
+CAMERA_FPS_TARGET = None  # 未单独指定 fps 的视频源的识别帧率上限
+
+# 识别子进程数量，0 表示在推理线程中直接识别；大于 0 时使用多进程识别池
+RECOGNITION_WORKERS = 0
+
+# 推理调度器（detection/scheduler.py）：多个调用方提交的人脸攒批后一起编码和比对
+# 每批最多 max_batch_size 个，最早的请求最多等待 max_wait_ms 毫秒；等待中的请求超过 max_queue 个时提交方被阻塞
+INFERENCE_SCHEDULER = {"max_batch_size": 16, "max_wait_ms": 5, "max_queue": 256}
+
+# 识别服务（python -m service.server）：监听地址，解码线程数和检测进程数，单张图片或单帧的大小上限（MB）
+SERVICE = {"host": "127.0.0.1", "port": 8765, "workers": 4, "max_body_mb": 20}
+
+# 人脸检测缩放比例：在缩小的画面上检测人脸，坐标映射回原图后再用原图计算编码
+# 例如 0.5 或 0.25；缩得越小越快，但远处的小脸越容易漏检
+# "auto" 表示根据实测检测耗时在 1.0 ~ 0.25 之间自动选择，使单帧检测耗时不超过预算
+DETECTION_SCALE = 1.0
+DETECTION_LATENCY_BUDGET_MS = 50
+
+# 人脸跟踪：每隔 detect_interval 帧检测一次，中间帧用模板匹配跟踪；
+# 每条轨迹只在新出现或每隔 reencode_interval 帧时重新编码，身份由最近 vote_window 次识别投票决定
+# 设为 None 表示每帧都检测和编码
+TRACKING = {
+    "detect_interval": 3,
+    "reencode_interval": 15,
+    "vote_window": 15,
+}
+
+# 运动门控：在缩小的灰度画面上做背景差分，画面静止时跳过人脸检测，有运动时只检测运动区域附近
+# roi 为静态检测区域：掩码图片路径（白色为检测区域），或按画面比例给出的矩形列表 [(top, right, bottom, left), ...]
+# 设为 None 表示每次都检测整帧；只在推理线程中生效，多进程识别时各帧乱序到达，不做门控
+MOTION_GATE = {
+    "scale": 0.25,
+    "threshold": 25,
+    "min_area": 0.002,
+    "hold_frames": 15,
+    "roi": None,
+}
+
+# 人脸编码备忘：截图的感知哈希相差不超过 max_hamming 位（共 64 位）、人脸框位移和大小变化不超过
+# max_shift / max_scale（相对框边长）时，复用上次的编码和比对结果；条目 ttl 秒后过期重新编码，最多 capacity 个
+# 命中率和节省的时间见统计中的 memo_hit_rate / memo_saved_ms；设为 None 表示每次都编码
+ENCODING_MEMO = {
+    "capacity": 256,
+    "ttl": 2.0,
+    "max_hamming": 6,
+    "max_shift": 0.15,
+    "max_scale": 0.15,
+}
+
+# 人员头像缩略图：缩放好的头像在内存中缓存 THUMBNAIL_CACHE_SIZE 张，并保存到磁盘目录供下次启动使用
+THUMBNAIL_CACHE_DIR = os.path.join(DATA_ROOT, ".thumbnails")
+THUMBNAIL_CACHE_SIZE = 64
+
+# 到访记录：同一人连续出现（间隔不超过 visit_gap 秒）合并为一条 (姓名, 首次/最后出现时间, 摄像头, 最小距离, 截图)
+# backend 为 "sqlite"（WAL 模式，path 为数据库文件）或 "jsonl"（path 为目录，按天轮转）；设为 None 表示不记录
+ACCESS_LOG = {
+    "backend": "sqlite",
+    "path": os.path.join(DATA_ROOT, "access_log.db"),
+    "snapshot_dir": os.path.join(DATA_ROOT, "snapshots"),  # 到访截图保存目录，None 表示不保存
+    "visit_gap": 10.0,
+    "batch_size": 50,
+    "flush_interval": 2.0,
+}
+
+# 性能统计：记录采集、检测、编码、比对、绘制、界面刷新等各阶段耗时的滚动统计；关闭时不产生额外开销
+METRICS_ENABLED = False
+METRICS_WINDOW = 300  # 每个阶段保留最近多少次耗时
+METRICS_OVERLAY = True  # 开启统计时在画面左上角显示帧率和各阶段 p50/p95
+METRICS_DUMP_PATH = os.path.join(DATA_ROOT, "metrics.jsonl")  # 定期追加写入统计快照的文件，None 表示不写
+METRICS_DUMP_INTERVAL = 10  # 写入间隔（秒）
+
+# 启动计时：画面第一帧应在 STARTUP_TARGET_MS 毫秒内显示（从进程启动算起，人脸库在后台加载不计入）
+# 画面和人脸库都就绪后输出启动报告，并追加写入 STARTUP_PROFILE_PATH（None 表示不写）
+STARTUP_TARGET_MS = 2000
+STARTUP_PROFILE_PATH = os.path.join(DATA_ROOT, "startup_profile.jsonl")
+
+# 热更新：每隔多少秒检查一次已知人脸目录和人员信息文件，有变化时在后台重新加载；None 表示关闭
+HOT_RELOAD_INTERVAL = 2.0
@@ -0,0 +1,92 @@
+import os
+import cv2
+import numpy as np
+
+# OpenCV DNN 人脸检测模型默认存放位置（ResNet-10 SSD，需要自行下载 deploy.prototxt 和 caffemodel）
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+# dlib HOG 检测器（face_recognition 默认），model="cnn" 时使用 dlib 的 CNN 模型
+class HOGDetector:
+    name = "hog"
+
+    def __init__(self, upsample=1, model="hog"):
+        self.upsample = upsample  # 检测前放大的次数，越大越能检测到小脸，也越慢
+        self.model = model
+
+    def detect(self, rgb_frame):
+        """返回人脸框列表 [(top, right, bottom, left), ...]"""
+        import face_recognition  # 导入时加载 dlib 模型，推迟到第一次检测
+
+        return face_recognition.face_locations(rgb_frame, self.upsample, self.model)
+
+
+# OpenCV 级联分类器检测器（Haar 或 LBP），比 HOG 快很多，但侧脸和暗光下漏检更多
+class CascadeDetector:
+    name = "cascade"
+
+    def __init__(self, cascade="haarcascade_frontalface_default.xml", scale_factor=1.1, min_neighbors=5,
+                 min_size=40):
+        if not hasattr(cv2, "CascadeClassifier"):
+            # OpenCV 5 把级联分类器移到了 contrib 模块
+            raise ImportError("当前 OpenCV 不包含级联分类器，请安装 opencv-python 4.x 或 opencv-contrib-python")
+        # 只给出文件名时从 OpenCV 自带的级联文件目录中查找
+        path = cascade
+        if not os.path.exists(path) and hasattr(cv2, "data"):
+            path = os.path.join(cv2.data.haarcascades, cascade)
+        self.classifier = cv2.CascadeClassifier(path)
+        if self.classifier.empty():
+            raise FileNotFoundError(f"无法加载级联分类器: {cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size  # 最小人脸边长（像素）
+
+    def detect(self, rgb_frame):
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY))
+        boxes = self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                                 minSize=(self.min_size, self.min_size))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in boxes]
+
+
+# OpenCV DNN 的 ResNet-10 SSD 检测器，需要本地存在模型文件
+class DNNDetector:
+    name = "dnn"
+
+    def __init__(self, model_path=os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel"),
+                 config_path=os.path.join(MODELS_DIR, "deploy.prototxt"), confidence=0.5, input_size=300):
+        for path in (model_path, config_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN 检测器模型文件不存在: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        # 模型按 BGR 训练，均值也是 BGR 顺序
+        blob = cv2.dnn.blobFromImage(rgb_frame, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0),
+                                     swapRB=True)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = np.clip(detections[:, 3:7], 0.0, 1.0) * [width, height, width, height]
+
+        locations = []
+        for left, top, right, bottom in boxes.astype(int):
+            if right > left and bottom > top:
+                locations.append((int(top), int(right), int(bottom), int(left)))
+        return locations
+
+
+DETECTORS = {
+    HOGDetector.name: HOGDetector,
+    CascadeDetector.name: CascadeDetector,
+    DNNDetector.name: DNNDetector,
+}
+
+
+def create_detector(backend, **params):
+    """按名称创建检测后端"""
+    if backend not in DETECTORS:
+        raise ValueError(f"未知的检测后端: {backend}，可选: {', '.join(DETECTORS)}")
+    return DETECTORS[backend](**params)
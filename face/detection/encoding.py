@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def batch_face_encodings(rgb_frame, face_locations, num_jitters=1):
+    """
+    一次性计算一帧中所有人脸的 128 维编码。
+    先对所有人脸提取 5 点关键点（与 face_recognition.face_encodings 默认的 small 模型一致），
+    再把全部人脸一起送进 dlib 的编码网络，避免逐个人脸调用。
+    """
+    if not face_locations:
+        return np.zeros((0, 128))
+
+    # face_recognition 导入时要加载 dlib 模型，推迟到第一次编码时再导入，不拖慢程序启动
+    import dlib
+    import face_recognition
+    from face_recognition import api as face_recognition_api
+
+    shapes = dlib.full_object_detections()
+    for top, right, bottom, left in face_locations:
+        shapes.append(face_recognition_api.pose_predictor_5_point(rgb_frame, dlib.rectangle(left, top, right, bottom)))
+
+    try:
+        descriptors = face_recognition_api.face_encoder.compute_face_descriptor(rgb_frame, shapes, num_jitters)
+    except TypeError:
+        # 旧版本 dlib 没有批量接口，退回逐个计算
+        return np.array(face_recognition.face_encodings(rgb_frame, face_locations, num_jitters))
+    return np.array([np.array(descriptor) for descriptor in descriptors])
+
+
+def batch_image_encodings(rgb_images, face_locations, num_jitters=1):
+    """
+    一次性计算多张图片中各一张人脸的编码，face_locations[i] 为第 i 张图片中人脸的位置。
+    用于把不同来源的人脸（例如多个调用方提交的人脸截图）合并成一批送进编码网络。
+    """
+    if not rgb_images:
+        return np.zeros((0, 128))
+
+    import dlib
+    from face_recognition import api as face_recognition_api
+
+    batch_shapes = []
+    for rgb_image, (top, right, bottom, left) in zip(rgb_images, face_locations):
+        shapes = dlib.full_object_detections()
+        shapes.append(face_recognition_api.pose_predictor_5_point(rgb_image, dlib.rectangle(left, top, right, bottom)))
+        batch_shapes.append(shapes)
+
+    try:
+        descriptors = face_recognition_api.face_encoder.compute_face_descriptor(list(rgb_images), batch_shapes,
+                                                                                num_jitters)
+    except TypeError:
+        # 旧版本 dlib 不支持多张图片一起编码，逐张图片计算
+        return np.concatenate([batch_face_encodings(rgb_image, [location], num_jitters)
+                               for rgb_image, location in zip(rgb_images, face_locations)])
+    return np.array([np.array(image_descriptors[0]) for image_descriptors in descriptors])
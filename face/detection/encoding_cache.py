@@ -0,0 +1,133 @@
+import hashlib
+import os
+import numpy as np
+
+# 缓存格式版本，缓存文件结构变化时递增
+CACHE_VERSION = 1
+# 编码模型标识，更换模型或编码参数时修改，旧缓存会整体失效
+ENCODING_MODEL = "dlib_face_recognition_resnet_model_v1:jitters=1"
+ENCODING_DIM = 128
+
+
+def file_hash(filepath, chunk_size=1 << 20):
+    """计算文件内容的 sha1 摘要"""
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 已知人脸编码的磁盘缓存
+class EncodingCache:
+    def __init__(self, cache_path, model_tag=ENCODING_MODEL):
+        self.cache_path = cache_path
+        self.model_tag = model_tag
+        self.entries = {}  # 绝对路径 -> (文件大小, mtime_ns, sha1, 编码或 None)
+        self.dirty = False  # 是否有改动需要写回
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return
+
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                version = int(data["version"])
+                model_tag = str(data["model"])
+                if version != CACHE_VERSION or model_tag != self.model_tag:
+                    print("编码缓存版本不一致，将重新生成。")
+                    self.dirty = True
+                    return
+
+                paths = data["paths"]
+                sizes = data["sizes"]
+                mtimes = data["mtimes"]
+                hashes = data["hashes"]
+                has_face = data["has_face"]
+                encodings = data["encodings"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"编码缓存读取失败，将重新生成: {e}")
+            self.dirty = True
+            return
+
+        for i, path in enumerate(paths):
+            encoding = encodings[i].copy() if has_face[i] else None
+            self.entries[str(path)] = (int(sizes[i]), int(mtimes[i]), str(hashes[i]), encoding)
+
+    def lookup(self, filepath):
+        """返回 (是否命中, 编码)；文件新增或内容变化时未命中"""
+        key = os.path.abspath(filepath)
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+
+        stat = os.stat(key)
+        size, mtime, digest, encoding = entry
+        if size == stat.st_size and mtime == stat.st_mtime_ns:
+            return True, encoding
+
+        # 修改时间变了但内容可能没变（复制、touch），用哈希确认
+        if size == stat.st_size and file_hash(key) == digest:
+            self.entries[key] = (size, stat.st_mtime_ns, digest, encoding)
+            self.dirty = True
+            return True, encoding
+
+        return False, None
+
+    def store(self, filepath, encoding):
+        """记录图片的编码，encoding 为 None 表示图片中没有可用人脸"""
+        key = os.path.abspath(filepath)
+        stat = os.stat(key)
+        if encoding is not None:
+            encoding = np.asarray(encoding, dtype=np.float64)
+        self.entries[key] = (stat.st_size, stat.st_mtime_ns, file_hash(key), encoding)
+        self.dirty = True
+
+    def discard(self, filepath):
+        """删除一张图片的缓存项（图片已删除时调用）"""
+        if self.entries.pop(os.path.abspath(filepath), None) is not None:
+            self.dirty = True
+
+    def prune(self, existing_paths):
+        """删除已经不存在的图片对应的缓存项"""
+        keep = {os.path.abspath(p) for p in existing_paths}
+        for key in list(self.entries):
+            if key not in keep:
+                del self.entries[key]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        keys = sorted(self.entries)
+        count = len(keys)
+        sizes = np.zeros(count, dtype=np.int64)
+        mtimes = np.zeros(count, dtype=np.int64)
+        has_face = np.zeros(count, dtype=bool)
+        encodings = np.zeros((count, ENCODING_DIM), dtype=np.float64)
+        hashes = []
+        for i, key in enumerate(keys):
+            size, mtime, digest, encoding = self.entries[key]
+            sizes[i] = size
+            mtimes[i] = mtime
+            hashes.append(digest)
+            if encoding is not None:
+                has_face[i] = True
+                encodings[i] = encoding
+
+        # 先写临时文件再替换，避免中途退出留下损坏的缓存
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f,
+                     version=np.int64(CACHE_VERSION),
+                     model=np.str_(self.model_tag),
+                     paths=np.array(keys, dtype=np.str_),
+                     sizes=sizes,
+                     mtimes=mtimes,
+                     hashes=np.array(hashes, dtype=np.str_),
+                     has_face=has_face,
+                     encodings=encodings)
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# 感知哈希：人脸区域缩放到 HASH_INPUT_SIZE 见方做 DCT，取左上 8x8 低频系数与中位数比较，得到 64 位哈希
+HASH_INPUT_SIZE = 32
+HASH_BITS = 8
+
+
+def perceptual_hash(rgb_frame, box):
+    """人脸框内图像的 64 位 DCT 感知哈希，光照和压缩噪声的小变化只影响少数几位"""
+    top, right, bottom, left = box
+    height, width = rgb_frame.shape[:2]
+    crop = rgb_frame[max(top, 0):min(bottom, height), max(left, 0):min(right, width)]
+    if crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (HASH_INPUT_SIZE, HASH_INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(small.astype(np.float32))[:HASH_BITS, :HASH_BITS].flatten()
+    # 直流分量只反映整体亮度，不参与中位数计算
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# 人脸编码备忘：同一个人站着不动时，相邻帧的人脸截图几乎一样，直接复用上次的 128 维编码和比对结果，
+# 跳过耗时的编码网络。键为人脸截图的感知哈希加人脸框的位置和大小；
+# 哈希相差不超过 max_hamming 位、框的位移和大小变化都在比例范围内时视为同一张脸。
+# 条目超过 ttl 秒过期（保证定期重新编码），超过 capacity 个时淘汰最久未使用的
+class EncodingMemo:
+    def __init__(self, capacity=256, ttl=2.0, max_hamming=6, max_shift=0.15, max_scale=0.15):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_hamming = max_hamming
+        self.max_shift = max_shift  # 框中心位移不超过框边长的比例
+        self.max_scale = max_scale  # 框边长变化不超过的比例
+        self.entries = OrderedDict()  # 编号 -> [哈希, 人脸框, 编码, 比对结果, 匹配器, 写入时间]
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = None  # 未命中时单张人脸编码耗时的滑动平均，用于估算节省的时间
+        self.saved_seconds = 0.0
+
+    def same_box(self, a, b):
+        a_size = max(a[1] - a[3], a[2] - a[0], 1)
+        b_size = max(b[1] - b[3], b[2] - b[0], 1)
+        if abs(a_size - b_size) > self.max_scale * a_size:
+            return False
+        shift = max(abs((a[0] + a[2]) - (b[0] + b[2])), abs((a[1] + a[3]) - (b[1] + b[3]))) / 2
+        return shift <= self.max_shift * a_size
+
+    def lookup(self, frame_hash, box, now=None):
+        """
+        查找与这张人脸相同的条目，返回 (条目编号, 编码, 比对结果, 匹配器)，没有时返回 None。
+        命中的条目刷新 LRU 顺序和人脸框位置，人慢慢移动时也能持续命中，直到 ttl 到期
+        """
+        now = now if now is not None else time.monotonic()
+        if frame_hash is None:
+            self.misses += 1
+            return None
+        best_id, best_distance = None, self.max_hamming + 1
+        for entry_id, entry in list(self.entries.items()):
+            if now - entry[5] > self.ttl:
+                del self.entries[entry_id]
+                continue
+            distance = hamming(frame_hash, entry[0])
+            if distance < best_distance and self.same_box(entry[1], box):
+                best_id, best_distance = entry_id, distance
+        if best_id is None:
+            self.misses += 1
+            return None
+
+        entry = self.entries[best_id]
+        entry[1] = box
+        self.entries.move_to_end(best_id)
+        self.hits += 1
+        if self.encode_seconds is not None:
+            self.saved_seconds += self.encode_seconds
+        return best_id, entry[2], entry[3], entry[4]
+
+    def store(self, frame_hash, box, encoding, match, matcher, now=None):
+        if frame_hash is None:
+            return
+        now = now if now is not None else time.monotonic()
+        self.entries[self.next_id] = [frame_hash, box, encoding, match, matcher, now]
+        self.next_id += 1
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def update_match(self, entry_id, match, matcher):
+        """人脸库更新后用缓存的编码重新比对，只替换比对结果"""
+        entry = self.entries.get(entry_id)
+        if entry is not None:
+            entry[3] = match
+            entry[4] = matcher
+
+    def record_encode_time(self, seconds_per_face):
+        if self.encode_seconds is None:
+            self.encode_seconds = seconds_per_face
+        else:
+            self.encode_seconds = 0.9 * self.encode_seconds + 0.1 * seconds_per_face
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "saved_ms": round(self.saved_seconds * 1000, 1),
+        }
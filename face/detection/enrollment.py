@@ -0,0 +1,120 @@
+import os
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".png")
+# 计算清晰度前把人脸区域缩放到固定大小，使阈值与图片分辨率无关
+SHARPNESS_SIZE = 150
+
+
+def person_images(known_faces_dir):
+    """
+    列出已知人脸目录中每个人的登记图片，返回 {姓名: [图片路径, ...]}。
+    支持两种方式：目录下的单张图片 {姓名}.jpg，以及每人一个子目录 {姓名}/*.jpg
+    """
+    people = {}
+    for entry in sorted(os.listdir(known_faces_dir)):
+        if entry.startswith("."):
+            continue  # 缓存、索引等隐藏文件
+        path = os.path.join(known_faces_dir, entry)
+        if os.path.isdir(path):
+            images = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+            if images:
+                people.setdefault(entry, []).extend(images)
+        elif entry.lower().endswith(IMAGE_EXTENSIONS):
+            people.setdefault(os.path.splitext(entry)[0], []).append(path)
+    return people
+
+
+def images_of(known_faces_dir, name):
+    """一个人的全部登记图片，顺序与 person_images 一致；只查看这个人的文件，不扫描整个目录"""
+    images = [os.path.join(known_faces_dir, name + extension) for extension in IMAGE_EXTENSIONS
+              if os.path.isfile(os.path.join(known_faces_dir, name + extension))]
+    folder = os.path.join(known_faces_dir, name)
+    if os.path.isdir(folder):
+        images = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+                  if f.lower().endswith(IMAGE_EXTENSIONS)] + images
+    return images
+
+
+def sharpness(image, location):
+    """人脸区域的拉普拉斯方差，越小越模糊"""
+    top, right, bottom, left = location
+    face = cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_RGB2GRAY)
+    face = cv2.resize(face, (SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(face, cv2.CV_64F).var())
+
+
+def kmedoids(encodings, k, n_iter=20):
+    """在样本中选出 k 个中心点（medoid），返回样本下标"""
+    distances = np.linalg.norm(encodings[:, None, :] - encodings[None, :, :], axis=2)
+    # 初始中心：先取整体 medoid，再依次取离已有中心最远的样本
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    while len(medoids) < k:
+        nearest = distances[:, medoids].min(axis=1)
+        if nearest.max() == 0:
+            break  # 剩下的样本都与已有中心重复
+        medoids.append(int(np.argmax(nearest)))
+
+    for _ in range(n_iter):
+        assignments = np.argmin(distances[:, medoids], axis=1)
+        new_medoids = []
+        for cluster, medoid in enumerate(medoids):
+            members = np.flatnonzero(assignments == cluster)
+            if len(members) == 0:
+                new_medoids.append(medoid)
+                continue
+            new_medoids.append(int(members[np.argmin(distances[np.ix_(members, members)].sum(axis=1))]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+    return medoids
+
+
+# 人脸登记策略：每张登记图片先做质量检查，合格的样本再压缩为少量模板
+class EnrollmentPolicy:
+    def __init__(self, min_sharpness=50.0, min_face_size=60, templates="centroid", max_templates=3):
+        self.min_sharpness = min_sharpness  # 人脸区域拉普拉斯方差下限
+        self.min_face_size = min_face_size  # 人脸框短边下限（像素）
+        self.templates = templates  # "centroid" 每人一个平均模板，"medoids" 每人最多 max_templates 个样本中心
+        self.max_templates = max_templates
+
+    @property
+    def tag(self):
+        """质量策略标识，写入编码缓存，策略变化时旧缓存失效"""
+        return f"quality={self.min_sharpness},{self.min_face_size}"
+
+    def encode(self, image):
+        """
+        对一张登记图片做质量检查并编码，返回 (编码, 不合格原因)；合格时原因为 None。
+        要求图片中恰好一张人脸、人脸足够大且不模糊
+        """
+        import face_recognition  # 导入时加载 dlib 模型，推迟到真正需要编码时
+
+        locations = face_recognition.face_locations(image)
+        if not locations:
+            return None, "未检测到人脸"
+        if len(locations) > 1:
+            return None, f"检测到 {len(locations)} 张人脸"
+
+        location = locations[0]
+        top, right, bottom, left = location
+        if min(bottom - top, right - left) < self.min_face_size:
+            return None, f"人脸太小（{min(bottom - top, right - left)} 像素）"
+        score = sharpness(image, location)
+        if score < self.min_sharpness:
+            return None, f"图片模糊（清晰度 {score:.0f}）"
+
+        return face_recognition.face_encodings(image, locations)[0], None
+
+    def reduce(self, encodings):
+        """把一个人的全部样本压缩为模板，返回 (模板矩阵, 每个模板对应的样本下标)"""
+        encodings = np.asarray(encodings, dtype=np.float64)
+        if self.templates == "medoids":
+            medoids = kmedoids(encodings, min(self.max_templates, len(encodings)))
+            return encodings[medoids], medoids
+
+        centroid = encodings.mean(axis=0)
+        # 显示用的图片取离平均模板最近的样本
+        nearest = int(np.argmin(np.linalg.norm(encodings - centroid, axis=1)))
+        return centroid[None, :], [nearest]
@@ -1,68 +1,415 @@
 import cv2
 import numpy as np
+import copy
 import os
-import face_recognition
-from datetime import datetime
+import threading
+import time
+from collections import namedtuple
+from detection.detectors import create_detector
+from detection.encoding import batch_face_encodings
+from detection.encoding_cache import ENCODING_MODEL, EncodingCache
+from detection.encoding_memo import EncodingMemo, perceptual_hash
+from detection.enrollment import EnrollmentPolicy, images_of, person_images
+from detection.gallery import FaceGallery
+from detection.matchers import create_matcher
+from detection.motion import MotionGate
+from detection.scaling import AdaptiveScale, downscale, scale_locations
+from detection.tracker import FaceTracker
+from utils.metrics import NULL_METRICS
+
+FACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 未知人脸使用的默认头像
+UNKNOWN_FACE_IMAGE = os.path.join(FACE_DIR, "unknow_face", "unknow_face.png")
+# 默认的已知人脸目录，应用中由 config.KNOWN_FACES_DIR 指定
+DEFAULT_KNOWN_FACES_DIR = os.path.join(FACE_DIR, "known_faces")
+
+
+# 一张人脸的识别结果：位置 (top, right, bottom, left)、姓名（未匹配为 "unknow"，人脸库为空为 None）、
+# 与最相近已知人脸的距离、轨迹编号（未开启跟踪为 None）、已知人脸图片路径
+FaceResult = namedtuple("FaceResult", ["box", "name", "distance", "track_id", "image"])
+
+
+def display_name(name):
+    # 画面上标注的文字，未识别或未匹配的人脸显示为 "未知"
+    return name if name not in (None, "unknow") else "未知"
+
+
+def primary_face(faces):
+    """兼容原来只返回一个姓名的接口：取最后一张人脸的姓名和最后一张有结果的人脸图片"""
+    recognized_name = None
+    recognized_image = None
+    for face in faces:
+        recognized_name = face.name
+        if face.name is not None:
+            recognized_image = face.image  # 获取已知人脸图像路径
+    return recognized_name, recognized_image
+
 
 # 人脸识别类
 class FaceRecognizer:
-    def __init__(self, known_faces_dir=r"C:\Users\baby\Desktop\大实验\face\known_faces", tolerance=0.45):
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_images = []
+    def __init__(self, known_faces_dir=DEFAULT_KNOWN_FACES_DIR, tolerance=0.45, cache_path=None,
+                 matcher="brute", matcher_params=None, index_path=None, gallery=None, detector="hog", detector_params=None,
+                 detection_scale=1.0, latency_budget_ms=50, tracking=None, motion_gate=None, enrollment=None, metrics=None,
+                 defer_load=False, encoding_memo=None, save_index=True):
         self.tolerance = tolerance
-        self.load_known_faces(known_faces_dir)
+        self.metrics = metrics or NULL_METRICS  # 各阶段耗时统计，默认关闭
+        # 人脸检测后端（见 detection/detectors.py）
+        self.detector_name = detector
+        self.detector_params = detector_params or {}
+        self.detector = create_detector(detector, **self.detector_params)
+        # 检测缩放比例：在缩小的画面上检测人脸，再用原图计算编码；"auto" 表示按耗时预算自动选择
+        self.detection_scale = detection_scale
+        self.latency_budget_ms = latency_budget_ms
+        self.adaptive_scale = AdaptiveScale(latency_budget_ms) if detection_scale == "auto" else None
+        # 人脸跟踪参数（见 FaceTracker），None 表示每帧都检测并编码
+        self.tracking = tracking
+        self.tracker = FaceTracker(**tracking) if tracking is not None else None
+        # 运动门控参数（见 MotionGate），画面静止时跳过检测；None 表示每次都检测整帧
+        self.motion_gate_params = motion_gate
+        self.motion_gate = MotionGate(**motion_gate) if motion_gate is not None else None
+        # 编码备忘参数（见 EncodingMemo），几乎不变的人脸复用上次的编码；None 表示每次都编码
+        self.encoding_memo_params = encoding_memo
+        self.encoding_memo = EncodingMemo(**encoding_memo) if encoding_memo is not None else None
+        self.sources = []  # for_source 创建的各视频源识别器，人脸库更新时一起替换
+        self.sources_lock = threading.Lock()  # 创建视频源识别器和替换人脸库互斥，新识别器不会错过正在进行的替换
+        # 登记图片的质量检查和模板压缩参数（见 EnrollmentPolicy）
+        self.enrollment = EnrollmentPolicy(**(enrollment or {}))
+        self.known_faces_dir = known_faces_dir
+        self.cache_path = cache_path  # 编码缓存文件，默认放在 known_faces 目录下
+        self.encoding_cache = None  # 首次加载时读取，之后常驻内存供热更新使用
+        if gallery is not None:
+            # 直接使用已加载好的人脸库（例如识别子进程中的共享内存人脸库）
+            self.gallery = gallery
+        elif defer_load:
+            # 先用空人脸库启动，由调用方在后台线程中调用 load_progressively 加载
+            self.gallery = FaceGallery()
+        else:
+            self.gallery = self.load_known_faces(known_faces_dir)  # 已知人脸编码矩阵及对应的姓名、图片路径
+
+        # 人脸库匹配后端，非暴力搜索的索引会保存到磁盘，人脸库不变时直接读取
+        if index_path is None and matcher != "brute":
+            index_path = os.path.join(known_faces_dir, f".matcher_{matcher}.idx")
+        self.matcher_name = matcher
+        self.matcher_params = matcher_params or {}
+        self.index_path = index_path
+        self.save_index = save_index  # 为 False 时只读取磁盘上的索引，失效时在内存中重建但不写回（识别子进程）
+        if defer_load and gallery is None:
+            # 空人脸库不建索引，避免覆盖磁盘上已有的索引
+            self.matcher = create_matcher("brute", self.gallery)
+        else:
+            self.matcher = create_matcher(matcher, self.gallery, index_path=index_path, save=save_index,
+                                          **self.matcher_params)
+
         self.recognized_name = None
         self.recognized_image = None
         self.recognized_info = None
 
-    def load_known_faces(self, known_faces_dir):
+    def load_known_faces(self, known_faces_dir, on_progress=None, progress_interval=0.5):
+        """
+        扫描已知人脸目录并返回新的人脸库，只对新增或变化的图片重新编码。
+        每人可以是一张 {姓名}.jpg，也可以是一个 {姓名}/ 子目录，目录中的多张图片压缩为少量模板。
+        给出 on_progress 时，每隔 progress_interval 秒及完成时调用 on_progress(已加载的人脸库, 已处理人数, 总人数)
+        """
         if not os.path.exists(known_faces_dir):
             os.makedirs(known_faces_dir)
 
-        for filename in os.listdir(known_faces_dir):
-            if filename.endswith(".jpg") or filename.endswith(".png"):
-                name = os.path.splitext(filename)[0]
-                filepath = os.path.join(known_faces_dir, filename)
+        cache = self.open_encoding_cache(known_faces_dir)
+        gallery = FaceGallery()
+        seen_paths = []
+        people = person_images(known_faces_dir)
+        last_progress = time.monotonic()
+
+        for done, (name, filepaths) in enumerate(people.items(), 1):
+            seen_paths.extend(filepaths)
+            for template, image_path in self.person_templates(name, filepaths, cache):
+                gallery.add(name, image_path, template)  # 同时保存图片路径
+
+            if on_progress is not None and (done == len(people) or
+                                            time.monotonic() - last_progress >= progress_interval):
+                on_progress(gallery, done, len(people))
+                last_progress = time.monotonic()
+
+        # 删除已移除图片的缓存项并写回
+        cache.prune(seen_paths)
+        cache.save()
+        return gallery
+
+    def open_encoding_cache(self, known_faces_dir):
+        # 编码缓存首次使用时读取，之后常驻内存
+        cache_path = self.cache_path or os.path.join(known_faces_dir, ".encodings_cache.npz")
+        model_tag = f"{ENCODING_MODEL};{self.enrollment.tag}"
+        if self.encoding_cache is None or self.encoding_cache.cache_path != cache_path:
+            self.encoding_cache = EncodingCache(cache_path, model_tag)
+        return self.encoding_cache
+
+    def person_templates(self, name, filepaths, cache):
+        """一个人的全部登记图片压缩为模板，返回 [(模板, 图片路径), ...]；没有可用图片时为空"""
+        encodings = []
+        sample_paths = []
+        for filepath in filepaths:
+            # 只对新增或内容变化的图片重新检查和编码，不合格的图片缓存为 None
+            found, encoding = cache.lookup(filepath)
+            if not found:
+                import face_recognition  # 编码缓存全部命中时不需要导入
 
                 image = face_recognition.load_image_file(filepath)
-                encoding = face_recognition.face_encodings(image)
-                if encoding:
-                    self.known_face_encodings.append(encoding[0])
-                    self.known_face_names.append(name)
-                    self.known_face_images.append(filepath)  # 保存图片路径
-                else:
-                    print(f"无法识别 {filename} 中的人脸。")
+                encoding, reason = self.enrollment.encode(image)
+                cache.store(filepath, encoding)
+                if reason:
+                    print(f"{filepath} 未通过质量检查: {reason}")
 
-    def recognize_faces(self, frame):
-        # 将帧从 BGR 转换为 RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # 在当前帧中检测人脸位置和特征
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-        recognized_name = None
-        recognized_image = None
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=self.tolerance)
-            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-            name = "未知"
-            recognized_name = None
-
-            if matches:
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    recognized_name = name
-                    recognized_image = self.known_face_images[best_match_index]  # 获取已知人脸图像路径
-                else:
-                    recognized_name = "unknow"
-                    recognized_image = r"face\unknow_face\unknow_face.png" 
-
-            # 在画面中标记人脸
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            if encoding is not None:
+                encodings.append(encoding)
+                sample_paths.append(filepath)
+
+        if not encodings:
+            print(f"{name} 没有可用的人脸图片。")
+            return []
+        # 每人的多张样本压缩为少量模板，人脸库保持紧凑
+        templates, indices = self.enrollment.reduce(encodings)
+        return [(template, sample_paths[index]) for template, index in zip(templates, indices)]
+
+    def update_person(self, name, new_encodings=None, removed_paths=()):
+        """
+        只重新生成一个人的模板并替换人脸库（登记或删除这个人的图片后调用），不扫描整个目录，其他人的模板原样复制。
+        new_encodings 为调用方已经算好的 {新图片路径: 编码}，直接写入编码缓存，不再重新编码；
+        removed_paths 为已删除的图片，从编码缓存中去掉。这个人没有图片后从人脸库中删除
+        """
+        cache = self.open_encoding_cache(self.known_faces_dir)
+        for filepath, encoding in (new_encodings or {}).items():
+            cache.store(filepath, encoding)
+        for filepath in removed_paths:
+            cache.discard(filepath)
+        filepaths = images_of(self.known_faces_dir, name)
+        templates = self.person_templates(name, filepaths, cache) if filepaths else []
+        cache.save()
+
+        gallery = self.gallery.without(name, extra=len(templates))
+        for template, image_path in templates:
+            gallery.add(name, image_path, template)
+        matcher = create_matcher(self.matcher_name, gallery, index_path=self.index_path, save=self.save_index,
+                                 **self.matcher_params)
+        self.set_gallery(gallery, matcher)
+        return gallery
+
+    def reload_known_faces(self):
+        """
+        重新加载已知人脸目录（在后台线程调用）。新人脸库和匹配器建好后一次性替换，
+        识别线程要么用旧库要么用新库，不需要暂停；已删除的人员立即不再匹配。
+        """
+        gallery = self.load_known_faces(self.known_faces_dir)
+        matcher = create_matcher(self.matcher_name, gallery, index_path=self.index_path, save=self.save_index,
+                                 **self.matcher_params)
+        self.set_gallery(gallery, matcher)
+        return gallery
+
+    def load_progressively(self, on_progress=None, progress_interval=0.5):
+        """
+        在后台线程中加载人脸库并分批生效：每隔 progress_interval 秒把已编码的部分换上（暴力匹配），
+        启动时不必等全部图片编码完；加载完成后再换成配置的匹配后端。
+        on_progress(已处理人数, 总人数) 在每批生效后调用，返回完整的人脸库
+        """
+        def publish(gallery, done, total):
+            if done < total:
+                # 加载线程还会继续往 gallery 中添加，生效的是一份快照
+                snapshot = FaceGallery.from_matrix(gallery.matrix.copy(), gallery.names, gallery.images)
+                self.set_gallery(snapshot, create_matcher("brute", snapshot))
+            if on_progress is not None:
+                on_progress(done, total)
+
+        gallery = self.load_known_faces(self.known_faces_dir, publish, progress_interval)
+        matcher = create_matcher(self.matcher_name, gallery, index_path=self.index_path, save=self.save_index,
+                                 **self.matcher_params)
+        self.set_gallery(gallery, matcher)
+        return gallery
 
+    def set_gallery(self, gallery, matcher):
+        """替换本识别器及各视频源识别器的人脸库和匹配器，已跟踪的人脸重新比对"""
+        with self.sources_lock:
+            for recognizer in [self] + self.sources:
+                recognizer.matcher = matcher
+                recognizer.gallery = gallery
+                if recognizer.tracker is not None:
+                    recognizer.tracker.gallery_version += 1
+
+    def for_source(self):
+        """
+        为一路视频源创建识别器：人脸库、匹配器和检测模型与本识别器共用，不额外占内存，
+        跟踪、运动门控、自适应缩放等与画面相关的状态每路各自独立
+        """
+        # 复制和登记在同一把锁内，复制到的人脸库之后的每次替换都会作用到新识别器
+        with self.sources_lock:
+            recognizer = copy.copy(self)
+            recognizer.sources = []
+            recognizer.sources_lock = threading.Lock()
+            recognizer.tracker = FaceTracker(**self.tracking) if self.tracking is not None else None
+            recognizer.motion_gate = MotionGate(**self.motion_gate_params) \
+                if self.motion_gate_params is not None else None
+            recognizer.adaptive_scale = AdaptiveScale(self.latency_budget_ms) if self.detection_scale == "auto" else None
+            recognizer.encoding_memo = EncodingMemo(**self.encoding_memo_params) \
+                if self.encoding_memo_params is not None else None
+            recognizer.recognized_name = None
+            recognizer.recognized_image = None
+            recognizer.recognized_info = None
+            self.sources.append(recognizer)
+        return recognizer
+
+    def remove_source(self, recognizer):
+        """视频源（例如识别服务的一条流）结束后调用，之后人脸库更新不再替换它的人脸库"""
+        with self.sources_lock:
+            if recognizer in self.sources:
+                self.sources.remove(recognizer)
+
+    def recognize_faces(self, frame):
+        # 识别人脸并直接在帧上标记
+        faces, recognized_name, recognized_image = self.identify(frame)
+        self.draw_faces(frame, faces)
         return frame, recognized_name, recognized_image
+
+    def recognize_frame(self, frame):
+        """识别一帧中的所有人脸，返回 FaceResult 列表，不修改帧"""
+        return self.identify(frame)[0]
+
+    def identify(self, frame, rgb=False):
+        """只做检测和比对，不修改帧；返回 (FaceResult 列表, 识别到的姓名, 图片路径)。rgb 为 True 表示帧已经是 RGB"""
+        # 将帧从 BGR 转换为 RGB，采集流水线中的帧已经转换过
+        rgb_frame = frame if rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.tracker is not None:
+            faces = self.identify_tracked(rgb_frame)
+        else:
+            # 在当前帧中检测人脸位置和特征，并与人脸库比对
+            face_locations = self.detect_faces(rgb_frame)
+            matches = self.match_faces(rgb_frame, face_locations)
+            faces = [FaceResult(location, name, distance, None, image)
+                     for location, (name, distance, image) in zip(face_locations, matches)]
+
+        recognized_name, recognized_image = primary_face(faces)
+        return faces, recognized_name, recognized_image
+
+    def identify_tracked(self, rgb_frame):
+        # 隔几帧检测一次，中间帧只跟踪；只有新出现的或到期的轨迹才重新计算编码
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        if self.tracker.should_detect():
+            # 已有轨迹的位置总是参与检测，人站着不动时也不会丢失
+            face_locations = self.detect_faces(rgb_frame, keep=[track.box for track in self.tracker.tracks])
+            with self.metrics.timer("track"):
+                tracks = self.tracker.update(gray, face_locations)
+        else:
+            with self.metrics.timer("track"):
+                tracks = self.tracker.follow(gray)
+
+        stale_tracks = [track for track in tracks if self.tracker.needs_encoding(track)]
+        matches = self.match_faces(rgb_frame, [track.box for track in stale_tracks])
+        for track, (name, distance, image) in zip(stale_tracks, matches):
+            track.vote(name, distance, image, self.tracker.gallery_version)
+
+        # 每条轨迹的身份由多帧投票决定，避免名字闪烁
+        return [FaceResult(track.box, *track.identity[:2], track.track_id, track.identity[2]) for track in tracks]
+
+    def match_faces(self, rgb_frame, face_locations):
+        """
+        计算人脸编码并一次性与人脸库比对，返回每张人脸的 (姓名, 距离, 图片路径)。
+        未匹配上时姓名为 "unknow"，人脸库为空时为 None。
+        """
+        if not face_locations:
+            return []
+        if self.encoding_memo is not None:
+            return self.match_faces_memo(rgb_frame, face_locations)
+        with self.metrics.timer("encode"):
+            face_encodings = batch_face_encodings(rgb_frame, face_locations)
+        return self.match_encodings(face_encodings)
+
+    def match_faces_memo(self, rgb_frame, face_locations):
+        # 先按感知哈希和人脸框查备忘，只对没命中的人脸计算编码
+        memo = self.encoding_memo
+        matcher = self.matcher
+        now = time.monotonic()
+        with self.metrics.timer("memo"):
+            hashes = [perceptual_hash(rgb_frame, location) for location in face_locations]
+            found = [memo.lookup(frame_hash, location, now) for frame_hash, location in zip(hashes, face_locations)]
+
+        matches = [None] * len(face_locations)
+        misses = [i for i, entry in enumerate(found) if entry is None]
+        if misses:
+            start = time.perf_counter()
+            with self.metrics.timer("encode"):
+                face_encodings = batch_face_encodings(rgb_frame, [face_locations[i] for i in misses])
+            memo.record_encode_time((time.perf_counter() - start) / len(misses))
+            for i, encoding, match in zip(misses, face_encodings, self.match_encodings(face_encodings)):
+                matches[i] = match
+                memo.store(hashes[i], face_locations[i], encoding, match, matcher, now)
+
+        # 命中的条目如果是旧人脸库的比对结果，用缓存的编码重新比对
+        stale = [i for i, entry in enumerate(found) if entry is not None and entry[3] is not matcher]
+        if stale:
+            for i, match in zip(stale, self.match_encodings([found[i][1] for i in stale])):
+                memo.update_match(found[i][0], match, matcher)
+                found[i] = (found[i][0], found[i][1], match, matcher)
+        for i, entry in enumerate(found):
+            if entry is not None:
+                matches[i] = entry[2]
+
+        self.metrics.set_gauge("memo_hit_rate", round(memo.hit_rate, 3))
+        self.metrics.set_gauge("memo_saved_ms", round(memo.saved_seconds * 1000))
+        return matches
+
+    def match_encodings(self, face_encodings):
+        """把一批人脸编码（可以来自多帧）一次性与人脸库比对，返回值同 match_faces"""
+        if len(face_encodings) == 0:
+            return []
+        # 人脸库可能被热更新替换，取一次引用，保证本次比对的索引和姓名来自同一个人脸库
+        matcher = self.matcher
+        gallery = matcher.gallery
+        with self.metrics.timer("match"):
+            best_indices, best_distances = matcher.search(face_encodings, k=1)
+
+        matches = []
+        for i in range(len(face_encodings)):
+            if not len(gallery):
+                matches.append((None, float("inf"), None))
+                continue
+
+            best_match_index = best_indices[i, 0]
+            distance = float(best_distances[i, 0])
+            if best_match_index >= 0 and distance <= self.tolerance:
+                matches.append((gallery.names[best_match_index], distance, gallery.images[best_match_index]))
+            else:
+                matches.append(("unknow", distance, UNKNOWN_FACE_IMAGE))
+        return matches
+
+    def detect_faces(self, rgb_frame, keep=()):
+        # 开启运动门控时只在运动区域（以及 keep 给出的区域）内检测，画面静止时直接跳过
+        if self.motion_gate is not None:
+            with self.metrics.timer("motion"):
+                regions = self.motion_gate.regions(rgb_frame, keep)
+            self.metrics.set_gauge("motion_skip_ratio", round(self.motion_gate.skip_ratio, 3))
+            if not regions:
+                return []
+        else:
+            height, width = rgb_frame.shape[:2]
+            regions = [(0, width, height, 0)]
+
+        # 在缩小的画面上检测，坐标映射回原图，编码仍使用原图以保证准确率
+        scale = self.adaptive_scale.scale if self.adaptive_scale else self.detection_scale
+        locations = []
+        start = time.perf_counter()
+        for top, right, bottom, left in regions:
+            region = rgb_frame if (top, left) == (0, 0) and (bottom, right) == rgb_frame.shape[:2] \
+                else np.ascontiguousarray(rgb_frame[top:bottom, left:right])
+            small_locations = self.detector.detect(downscale(region, scale))
+            for t, r, b, l in scale_locations(small_locations, scale, region.shape):
+                locations.append((t + top, r + left, b + top, l + left))
+        elapsed = time.perf_counter() - start
+        self.metrics.record("detect", elapsed)
+        if self.adaptive_scale:
+            self.adaptive_scale.update(elapsed)
+        return locations
+
+    @staticmethod
+    def draw_faces(frame, faces):
+        # 在画面中标记人脸
+        for face in faces:
+            top, right, bottom, left = face.box
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            cv2.putText(frame, display_name(face.name), (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return frame
@@ -0,0 +1,104 @@
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+# 已知人脸库：编码保存在一块连续的 float32 矩阵中，姓名和图片路径为平行数组
+class FaceGallery:
+    def __init__(self, capacity=1024, dim=ENCODING_DIM):
+        self.dim = dim
+        self.encodings = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self.sq_norms = np.zeros(max(capacity, 1), dtype=np.float32)  # 每行编码的平方范数，匹配时复用
+        self.names = []
+        self.images = []
+        self.size = 0
+
+    @classmethod
+    def from_matrix(cls, encodings, names, images):
+        """直接包装已有的编码矩阵（例如共享内存），不复制数据"""
+        gallery = cls.__new__(cls)
+        gallery.dim = encodings.shape[1]
+        gallery.encodings = encodings
+        gallery.sq_norms = np.einsum("ij,ij->i", encodings, encodings, dtype=np.float32)
+        gallery.names = list(names)
+        gallery.images = list(images)
+        gallery.size = len(encodings)
+        return gallery
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def matrix(self):
+        # 只返回已使用部分的视图，不复制
+        return self.encodings[:self.size]
+
+    def compact(self, encodings):
+        """
+        用内容相同的一份低精度或内存映射编码（例如量化匹配后端的 float16 重排数据）替换 float32 矩阵，
+        释放原矩阵，之后 matrix 返回这份编码；再添加人脸时会重新分配 float32 矩阵
+        """
+        if len(encodings) != self.size:
+            raise ValueError(f"编码行数 {len(encodings)} 与人脸库大小 {self.size} 不一致")
+        self.encodings = encodings
+        self.sq_norms = self.sq_norms[:self.size].copy()
+
+    def reserve(self, capacity):
+        if capacity <= self.encodings.shape[0]:
+            return
+        encodings = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        encodings[:self.size] = self.encodings[:self.size]
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+
+    def add(self, name, image_path, encoding):
+        if self.size == self.encodings.shape[0]:
+            self.reserve(max(self.size * 2, 1))  # 容量不足时翻倍，均摊后每次添加为常数开销
+        row = self.encodings[self.size]
+        row[:] = encoding
+        self.sq_norms[self.size] = np.dot(row, row)
+        self.names.append(name)
+        self.images.append(image_path)
+        self.size += 1
+        return self.size - 1
+
+    def without(self, name, extra=0):
+        """复制一份去掉某人全部模板的人脸库，并预留 extra 行供随后添加，其余行原样复制不重新计算"""
+        keep = [i for i, other in enumerate(self.names) if other != name]
+        gallery = FaceGallery(capacity=len(keep) + extra, dim=self.dim)
+        gallery.encodings[:len(keep)] = self.encodings[keep]
+        gallery.sq_norms[:len(keep)] = self.sq_norms[keep]
+        gallery.names = [self.names[i] for i in keep]
+        gallery.images = [self.images[i] for i in keep]
+        gallery.size = len(keep)
+        return gallery
+
+    def match(self, face_encodings, k=1):
+        """
+        将一帧中的所有人脸编码一次性与人脸库比对。
+        返回 (indices, distances)，形状均为 (人脸数, k)，按距离升序排列。
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dim)
+        k = min(k, self.size)
+        if len(queries) == 0 or k == 0:
+            return np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32)
+
+        gallery = self.matrix
+        # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q·g，用一次矩阵乘法算出全部距离
+        sq_dists = self.sq_norms[:self.size][None, :] - 2.0 * (queries @ gallery.T)
+        sq_dists += np.einsum("ij,ij->i", queries, queries)[:, None]
+
+        if k < self.size:
+            candidates = np.argpartition(sq_dists, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(self.size), sq_dists.shape)
+
+        # 对候选项按差值重新计算精确距离，避免展开式的舍入误差影响阈值判断
+        diffs = gallery[candidates] - queries[:, None, :]
+        distances = np.sqrt(np.einsum("fkd,fkd->fk", diffs, diffs))
+        order = np.argsort(distances, axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        return indices, distances
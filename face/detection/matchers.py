@@ -0,0 +1,432 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+try:
+    import hnswlib  # 可选依赖，仅 HNSW 后端需要
+except ImportError:
+    hnswlib = None
+
+INDEX_VERSION = 1
+
+
+def gallery_fingerprint(gallery, dtype=np.float32):
+    """人脸库内容摘要，用来判断磁盘上的索引是否与当前人脸库一致；dtype 为计算摘要前换算的精度"""
+    digest = hashlib.sha1()
+    digest.update(np.int64(len(gallery)).tobytes())
+    digest.update(np.ascontiguousarray(gallery.matrix, dtype=dtype).tobytes())
+    return digest.hexdigest()
+
+
+def rerank(gallery, query, candidate_ids, k):
+    """用精确欧氏距离对候选项排序，返回前 k 个 (索引, 距离)，不足 k 个时用 -1 / inf 补齐"""
+    indices = np.full(k, -1, dtype=np.int64)
+    distances = np.full(k, np.inf, dtype=np.float32)
+    if len(candidate_ids) == 0:
+        return indices, distances
+
+    diffs = gallery.matrix[candidate_ids] - query
+    candidate_distances = np.sqrt(np.einsum("ij,ij->i", diffs, diffs))
+    count = min(k, len(candidate_ids))
+    top = np.argpartition(candidate_distances, count - 1)[:count] if count < len(candidate_ids) else np.arange(count)
+    top = top[np.argsort(candidate_distances[top])]
+    indices[:count] = candidate_ids[top]
+    distances[:count] = candidate_distances[top]
+    return indices, distances
+
+
+# 精确暴力搜索，结果与逐个比对完全一致
+class BruteForceMatcher:
+    name = "brute"
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def build(self):
+        pass
+
+    def search(self, face_encodings, k=1):
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        found_indices, found_distances = self.gallery.match(queries, k=k)
+        indices[:, :found_indices.shape[1]] = found_indices
+        distances[:, :found_distances.shape[1]] = found_distances
+        return indices, distances
+
+    def save(self, index_path):
+        pass
+
+    def load(self, index_path):
+        return True
+
+
+# 倒排文件索引：先用 k-means 把人脸库分成若干簇，查询时只扫描最近的 n_probe 个簇
+# n_lists 越大、n_probe 越小，速度越快但召回率越低
+class IVFMatcher:
+    name = "ivf"
+
+    def __init__(self, gallery, n_lists=None, n_probe=8, n_iter=20, min_size=1024, seed=0):
+        self.gallery = gallery
+        self.n_lists = n_lists  # 簇数量，默认约为 4*sqrt(N)
+        self.n_probe = n_probe  # 每次查询扫描的簇数量
+        self.n_iter = n_iter
+        self.min_size = min_size  # 人脸库小于此规模时不分簇，直接全量扫描
+        self.seed = seed
+        self.centroids = np.zeros((0, gallery.dim), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)  # 第 i 个簇的成员为 list_ids[offsets[i]:offsets[i+1]]
+        self.list_ids = np.zeros(0, dtype=np.int64)
+
+    def build_params(self):
+        """影响索引结构的参数，保存在索引文件中，与当前配置不同时重建；n_probe 只影响查询，不在其中"""
+        return json.dumps({"n_lists": self.n_lists, "min_size": self.min_size, "n_iter": self.n_iter,
+                           "seed": self.seed}, sort_keys=True)
+
+    def build(self):
+        data = self.gallery.matrix
+        size = len(data)
+        if size == 0:
+            self.centroids = np.zeros((0, self.gallery.dim), dtype=np.float32)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            self.list_ids = np.zeros(0, dtype=np.int64)
+            return
+
+        n_lists = 1 if size < self.min_size else (self.n_lists or int(4 * np.sqrt(size)))
+        n_lists = max(1, min(n_lists, size))
+        self.centroids, assignments = kmeans(data, n_lists, self.n_iter, self.seed)
+
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def search(self, face_encodings, k=1):
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if len(queries) == 0 or len(self.centroids) == 0:
+            return indices, distances
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        centroid_dists = squared_distances(queries, self.centroids)
+        probes = np.argpartition(centroid_dists, n_probe - 1, axis=1)[:, :n_probe]
+
+        for i, query in enumerate(queries):
+            candidate_ids = np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]]
+                                            for c in probes[i]])
+            indices[i], distances[i] = rerank(self.gallery, query, candidate_ids, k)
+        return indices, distances
+
+    def save(self, index_path):
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f,
+                     version=np.int64(INDEX_VERSION),
+                     fingerprint=np.str_(gallery_fingerprint(self.gallery)),
+                     params=np.str_(self.build_params()),
+                     centroids=self.centroids,
+                     list_offsets=self.list_offsets,
+                     list_ids=self.list_ids)
+        os.replace(tmp_path, index_path)
+
+    def load(self, index_path):
+        if not os.path.exists(index_path):
+            return False
+        try:
+            with np.load(index_path, allow_pickle=False) as data:
+                if (int(data["version"]) != INDEX_VERSION or str(data["params"]) != self.build_params()
+                        or str(data["fingerprint"]) != gallery_fingerprint(self.gallery)):
+                    return False
+                self.centroids = data["centroids"]
+                self.list_offsets = data["list_offsets"]
+                self.list_ids = data["list_ids"]
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
+
+
+# 基于 hnswlib 的分层小世界图索引，ef 越大召回率越高、查询越慢
+class HNSWMatcher:
+    name = "hnsw"
+
+    def __init__(self, gallery, m=16, ef_construction=200, ef=64):
+        if hnswlib is None:
+            raise ImportError("HNSW 匹配后端需要安装 hnswlib: pip install hnswlib")
+        self.gallery = gallery
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.index = None
+
+    def build_params(self):
+        """影响图结构的参数，保存在元数据中，与当前配置不同时重建；ef 只影响查询，不在其中"""
+        return {"m": self.m, "ef_construction": self.ef_construction}
+
+    def _new_index(self):
+        index = hnswlib.Index(space="l2", dim=self.gallery.dim)
+        index.init_index(max_elements=max(len(self.gallery), 1), M=self.m, ef_construction=self.ef_construction)
+        return index
+
+    def build(self):
+        self.index = self._new_index()
+        if len(self.gallery):
+            self.index.add_items(self.gallery.matrix, np.arange(len(self.gallery)))
+        self.index.set_ef(self.ef)
+
+    def search(self, face_encodings, k=1):
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if len(queries) == 0 or len(self.gallery) == 0:
+            return indices, distances
+
+        count = min(k, len(self.gallery))
+        self.index.set_ef(max(self.ef, count))
+        labels, _ = self.index.knn_query(queries, k=count)
+        # hnswlib 返回平方距离，这里统一换算为精确欧氏距离
+        for i, query in enumerate(queries):
+            indices[i], distances[i] = rerank(self.gallery, query, labels[i].astype(np.int64), k)
+        return indices, distances
+
+    def save(self, index_path):
+        self.index.save_index(index_path)
+        with open(index_path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "fingerprint": gallery_fingerprint(self.gallery),
+                       "params": self.build_params()}, f)
+
+    def load(self, index_path):
+        meta_path = index_path + ".json"
+        if not os.path.exists(index_path) or not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if (meta.get("version") != INDEX_VERSION or meta.get("params") != self.build_params()
+                    or meta.get("fingerprint") != gallery_fingerprint(self.gallery)):
+                return False
+            index = hnswlib.Index(space="l2", dim=self.gallery.dim)
+            index.load_index(index_path, max_elements=max(len(self.gallery), 1))
+            if index.get_current_count() != len(self.gallery):
+                return False
+        except (OSError, ValueError, AttributeError, RuntimeError):
+            # 索引文件截断或损坏、元数据不是合法的 JSON 对象时重新建索引
+            return False
+        index.set_ef(self.ef)
+        self.index = index
+        return True
+
+
+def quantize(data, dtype):
+    """
+    压缩编码矩阵，返回 (编码, 每维缩放, 每维偏移)，还原值为 codes * scale + offset。
+    "float16" 直接转半精度；"uint8" 按每一维的取值范围线性量化为 0~255 的 8 位无符号整数
+    """
+    data = np.asarray(data, dtype=np.float32)
+    dim = data.shape[1]
+    if dtype == "float16":
+        return data.astype(np.float16), np.ones(dim, dtype=np.float32), np.zeros(dim, dtype=np.float32)
+    if dtype != "uint8":
+        raise ValueError(f"不支持的量化类型: {dtype}，可选: float16, uint8")
+
+    if len(data):
+        low, high = data.min(axis=0), data.max(axis=0)
+    else:
+        low, high = np.zeros(dim, dtype=np.float32), np.ones(dim, dtype=np.float32)
+    scale = np.maximum(high - low, 1e-12) / 255.0
+    codes = np.clip(np.rint((data - low) / scale), 0, 255).astype(np.uint8)
+    return codes, scale.astype(np.float32), low.astype(np.float32)
+
+
+# 量化人脸库：编码压缩为 float16 或 8 位整数连续存放（uint8 为原来的 1/4），先在压缩数据上算近似距离，
+# 再对前 rerank 个候选用 float16 编码计算精确距离。建好索引后人脸库的 float32 矩阵换成这份 float16 编码并释放，
+# 常驻内存的只有压缩编码；索引保存为 .npy，读取时可以内存映射，重排用的 float16 编码只有被访问的行才会读入内存
+class QuantizedMatcher:
+    name = "quantized"
+
+    def __init__(self, gallery, dtype="uint8", rerank=32, chunk_size=16384, mmap=True):
+        self.gallery = gallery
+        self.dtype = dtype
+        self.rerank = rerank  # 进入精确重排的候选数量
+        self.chunk_size = chunk_size  # 分块计算近似距离，避免把整个压缩矩阵转换为 float32
+        self.mmap = mmap  # 读取索引时是否使用内存映射
+        self.codes = None
+        self.scale = None
+        self.offset = None
+        self.code_norms = None  # 每行还原后编码减去偏移的平方范数
+        self.vectors = None  # 重排用的 float16 编码，dtype 为 float16 时就是 codes
+        self.fingerprint = None  # 压缩前人脸库的摘要，按 float16 精度计算，压缩后的人脸库摘要不变
+
+    def build(self):
+        self.fingerprint = gallery_fingerprint(self.gallery, np.float16)
+        data = self.gallery.matrix
+        self.codes, self.scale, self.offset = quantize(data, self.dtype)
+        self.vectors = self.codes if self.dtype == "float16" else np.asarray(data, dtype=np.float16)
+        self._update_norms()
+        self.gallery.compact(self.vectors)
+
+    def _update_norms(self):
+        self.code_norms = np.zeros(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_size):
+            values = self.codes[start:start + self.chunk_size].astype(np.float32) * self.scale
+            self.code_norms[start:start + self.chunk_size] = np.einsum("ij,ij->i", values, values)
+
+    def approximate(self, queries, count):
+        """在压缩数据上找出每个查询的前 count 个候选，返回 (候选索引, 近似平方距离)，形状 (F, count)"""
+        # ||q - (c*s + o)||^2 = ||q - o||^2 - 2 ((q - o)*s)·c + ||c*s||^2，c 为压缩编码
+        centered = queries - self.offset
+        weights = centered * self.scale
+        query_norms = np.einsum("ij,ij->i", centered, centered)[:, None]
+
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        best_dists = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_size):
+            chunk = self.codes[start:start + self.chunk_size].astype(np.float32)
+            dists = query_norms - 2.0 * (weights @ chunk.T) + self.code_norms[start:start + len(chunk)][None, :]
+            take = min(count, len(chunk))
+            top = np.argpartition(dists, take - 1, axis=1)[:, :take] if take < len(chunk) else \
+                np.broadcast_to(np.arange(len(chunk)), dists.shape)
+            # 与之前各块的候选合并，只保留前 count 个
+            best_ids = np.concatenate([best_ids, top + start], axis=1)
+            best_dists = np.concatenate([best_dists, np.take_along_axis(dists, top, axis=1)], axis=1)
+            if best_ids.shape[1] > count:
+                keep = np.argpartition(best_dists, count - 1, axis=1)[:, :count]
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+                best_dists = np.take_along_axis(best_dists, keep, axis=1)
+        return best_ids, best_dists
+
+    def search(self, face_encodings, k=1):
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if len(queries) == 0 or len(self.gallery) == 0:
+            return indices, distances
+
+        candidate_ids, _ = self.approximate(queries, min(max(self.rerank, k), len(self.gallery)))
+        for i, query in enumerate(queries):
+            indices[i], distances[i] = rerank(self.gallery, query, candidate_ids[i], k)
+        return indices, distances
+
+    def save(self, index_path):
+        # 压缩编码和重排编码单独存为 .npy 以便内存映射，其余参数存在 npz 中
+        arrays = {".codes.npy": self.codes}
+        if self.vectors is not self.codes:
+            arrays[".vectors.npy"] = self.vectors
+        for suffix, array in arrays.items():
+            path = index_path + suffix
+            np.save(path + ".tmp.npy", array)
+            try:
+                os.replace(path + ".tmp.npy", path)
+            except OSError as e:
+                # Windows 下旧索引仍被内存映射时无法替换，下次启动时重建即可
+                print(f"量化索引保存失败: {e}")
+                os.remove(path + ".tmp.npy")
+                return
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f,
+                     version=np.int64(INDEX_VERSION),
+                     fingerprint=np.str_(self.fingerprint),
+                     dtype=np.str_(self.dtype),
+                     scale=self.scale,
+                     offset=self.offset)
+        os.replace(tmp_path, index_path)
+        if self.mmap:
+            # 换成刚保存的内存映射文件，刚建索引时也不必在内存中保留重排编码
+            self.load(index_path)
+
+    def load(self, index_path):
+        codes_path = index_path + ".codes.npy"
+        vectors_path = index_path + ".vectors.npy"
+        if not os.path.exists(index_path) or not os.path.exists(codes_path):
+            return False
+        try:
+            with np.load(index_path, allow_pickle=False) as data:
+                fingerprint = self.fingerprint or gallery_fingerprint(self.gallery, np.float16)
+                if (int(data["version"]) != INDEX_VERSION or str(data["dtype"]) != self.dtype
+                        or str(data["fingerprint"]) != fingerprint):
+                    return False
+                scale = data["scale"]
+                offset = data["offset"]
+            mmap_mode = "r" if self.mmap else None
+            codes = np.load(codes_path, mmap_mode=mmap_mode)
+            vectors = codes if self.dtype == "float16" else np.load(vectors_path, mmap_mode=mmap_mode)
+            if len(codes) != len(self.gallery) or len(vectors) != len(self.gallery):
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self.fingerprint = fingerprint
+        owned = self.vectors is not None and self.gallery.encodings is self.vectors
+        self.codes, self.vectors, self.scale, self.offset = codes, vectors, scale, offset
+        self._update_norms()
+        # 人脸库已经是别处提供的同样内容的 float16 编码（识别子进程中映射的共享内存）时直接使用，不再替换；
+        # 刚建好索引、人脸库是本匹配器内存中的编码时换成内存映射
+        if owned or self.gallery.matrix.dtype != np.float16:
+            self.gallery.compact(self.vectors)
+        return True
+
+
+MATCHERS = {
+    BruteForceMatcher.name: BruteForceMatcher,
+    IVFMatcher.name: IVFMatcher,
+    HNSWMatcher.name: HNSWMatcher,
+    QuantizedMatcher.name: QuantizedMatcher,
+}
+
+
+def create_matcher(backend, gallery, index_path=None, save=True, **params):
+    """创建匹配后端；给出 index_path 时优先读取磁盘上的索引，失效则重建，save 为 True 时保存"""
+    if backend not in MATCHERS:
+        raise ValueError(f"未知的匹配后端: {backend}，可选: {', '.join(MATCHERS)}")
+
+    matcher = MATCHERS[backend](gallery, **params)
+    if index_path and matcher.load(index_path):
+        return matcher
+
+    matcher.build()
+    if index_path and save:
+        matcher.save(index_path)
+    return matcher
+
+
+def squared_distances(a, b):
+    sq = np.einsum("ij,ij->i", a, a)[:, None] + np.einsum("ij,ij->i", b, b)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(sq, 0.0)
+
+
+def kmeans(data, n_clusters, n_iter=20, seed=0, chunk_size=8192):
+    """纯 NumPy 的 Lloyd k-means，返回 (质心, 每个样本所属簇)"""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    assignments = np.zeros(len(data), dtype=np.int64)
+
+    for _ in range(n_iter):
+        # 分块计算最近质心，避免 N×K 距离矩阵占用过多内存
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmin(squared_distances(chunk, centroids), axis=1)
+
+        counts = np.bincount(assignments, minlength=n_clusters)
+        non_empty = counts > 0
+        # 按簇排序后分段求和，比 np.add.at 快得多
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(data[order], starts, axis=0)
+        new_centroids = centroids.copy()
+        new_centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        # 空簇重新随机取一个样本作为质心
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            new_centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        shift = np.abs(new_centroids - centroids).max()
+        centroids = new_centroids
+        if shift < 1e-6:
+            break
+
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        assignments[start:start + chunk_size] = np.argmin(squared_distances(chunk, centroids), axis=1)
+    return centroids, assignments
@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+
+def load_roi_mask(roi, shape):
+    """
+    把 ROI 配置转换为与 shape 同尺寸的掩码（非零表示需要检测）。
+    roi 可以是掩码图片路径（白色区域为检测区域），也可以是按画面比例给出的矩形列表 [(top, right, bottom, left), ...]
+    """
+    height, width = shape[:2]
+    if roi is None:
+        return None
+    if isinstance(roi, str):
+        mask = cv2.imread(roi, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            print(f"无法读取 ROI 掩码 {roi}，忽略")
+            return None
+        return cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for top, right, bottom, left in roi:
+        mask[int(top * height):int(bottom * height), int(left * width):int(right * width)] = 255
+    return mask
+
+
+def merge_boxes(boxes):
+    """合并相互重叠的框 (top, right, bottom, left)，直到没有重叠为止"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]:
+                    boxes[i] = (min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+# 运动门控：在缩小的灰度画面上与滑动平均背景做差分，画面静止时跳过人脸检测，
+# 有运动时只返回运动区域（外扩后）供检测使用；可以再用静态 ROI 掩码限制检测范围
+class MotionGate:
+    def __init__(self, scale=0.25, threshold=25, min_area=0.002, padding=0.5, hold_frames=15,
+                 learning_rate=0.05, full_frame_ratio=0.5, roi=None):
+        self.scale = scale
+        self.threshold = threshold  # 灰度差超过该值的像素视为运动
+        self.min_area = min_area  # 运动区域面积下限（占画面比例），过滤噪点
+        self.padding = padding  # 运动框按自身大小外扩的比例，运动区域往往是身体，人脸可能在框外
+        self.hold_frames = hold_frames  # 运动停止后继续检测上次区域的帧数
+        self.learning_rate = learning_rate  # 背景更新速度
+        self.full_frame_ratio = full_frame_ratio  # 运动区域超过画面该比例时直接检测整帧
+        self.roi = roi
+        self.background = None
+        self.roi_mask = None  # 缩小后画面尺寸的 ROI 掩码
+        self.roi_box = None  # ROI 的外接框，原图坐标
+        self.last_regions = []
+        self.idle_frames = 0
+        self.skipped = 0  # 跳过检测的帧数
+        self.ran = 0  # 执行检测的帧数
+
+    @property
+    def skip_ratio(self):
+        total = self.skipped + self.ran
+        return self.skipped / total if total else 0.0
+
+    def reset(self):
+        self.background = None
+        self.last_regions = []
+
+    def regions(self, rgb_frame, keep=()):
+        """
+        返回需要检测的区域列表 (top, right, bottom, left)，原图坐标；返回空列表表示本帧跳过检测。
+        keep 为一定要检测的区域，例如已有轨迹的人脸框，保证静止不动的人不会丢失。
+        """
+        height, width = rgb_frame.shape[:2]
+        small = cv2.resize(rgb_frame, (0, 0), fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            # 第一帧或分辨率变化：重建背景，检测整帧
+            self.background = gray.astype(np.float32)
+            self.roi_mask = load_roi_mask(self.roi, gray.shape)
+            self.roi_box = None
+            if self.roi_mask is not None and self.roi_mask.any():
+                x, y, w, h = cv2.boundingRect(self.roi_mask)
+                self.roi_box = (int(y / self.scale), min(int((x + w) / self.scale), width),
+                                min(int((y + h) / self.scale), height), int(x / self.scale))
+            regions = [self.roi_box or (0, width, height, 0)]
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+            _, motion = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+            if self.roi_mask is not None:
+                motion = cv2.bitwise_and(motion, self.roi_mask)
+            motion = cv2.dilate(motion, None, iterations=2)
+            contours, _ = cv2.findContours(motion, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+            min_area = self.min_area * gray.shape[0] * gray.shape[1]
+            regions = []
+            for contour in contours:
+                if cv2.contourArea(contour) < min_area:
+                    continue
+                x, y, w, h = cv2.boundingRect(contour)
+                pad = int(max(w, h) * self.padding)
+                regions.append((max(int((y - pad) / self.scale), 0),
+                                min(int((x + w + pad) / self.scale), width),
+                                min(int((y + h + pad) / self.scale), height),
+                                max(int((x - pad) / self.scale), 0)))
+
+            if regions:
+                self.idle_frames = 0
+            elif self.idle_frames < self.hold_frames:
+                # 刚停止运动时继续检测上次的区域
+                self.idle_frames += 1
+                regions = self.last_regions
+
+        for top, right, bottom, left in keep:
+            pad = int(max(bottom - top, right - left) * self.padding)
+            regions = regions + [(max(top - pad, 0), min(right + pad, width), min(bottom + pad, height), max(left - pad, 0))]
+
+        regions = merge_boxes(regions)
+        area = sum((bottom - top) * (right - left) for top, right, bottom, left in regions)
+        if area > self.full_frame_ratio * width * height:
+            regions = [self.roi_box or (0, width, height, 0)]
+        self.last_regions = regions
+
+        if regions:
+            self.ran += 1
+        else:
+            self.skipped += 1
+        return regions
@@ -0,0 +1,55 @@
+import cv2
+
+# 自适应模式可选的缩放比例，从大到小
+SCALE_LEVELS = (1.0, 0.75, 0.5, 0.35, 0.25)
+
+
+def downscale(frame, scale):
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def scale_locations(locations, scale, shape):
+    """把缩小图上的人脸框 (top, right, bottom, left) 映射回原图坐标，并裁剪到画面内"""
+    if scale >= 1.0:
+        return list(locations)
+    height, width = shape[:2]
+    scaled = []
+    for top, right, bottom, left in locations:
+        scaled.append((max(int(round(top / scale)), 0),
+                       min(int(round(right / scale)), width - 1),
+                       min(int(round(bottom / scale)), height - 1),
+                       max(int(round(left / scale)), 0)))
+    return scaled
+
+
+# 根据实测的检测耗时自动选择缩放比例，使每帧检测耗时保持在预算内
+class AdaptiveScale:
+    def __init__(self, budget_ms, levels=SCALE_LEVELS, smoothing=0.2):
+        self.budget = budget_ms / 1000.0
+        self.levels = sorted(levels, reverse=True)
+        self.smoothing = smoothing  # 耗时滑动平均的权重
+        self.level = 0
+        self.avg_time = None
+
+    @property
+    def scale(self):
+        return self.levels[self.level]
+
+    def update(self, elapsed):
+        if self.avg_time is None:
+            self.avg_time = elapsed
+        else:
+            self.avg_time += self.smoothing * (elapsed - self.avg_time)
+
+        # HOG 检测耗时大致与像素数成正比，即与缩放比例的平方成正比
+        if self.avg_time > self.budget and self.level < len(self.levels) - 1:
+            self.level += 1
+            self.avg_time *= (self.levels[self.level] / self.levels[self.level - 1]) ** 2
+        elif self.level > 0:
+            predicted = self.avg_time * (self.levels[self.level - 1] / self.scale) ** 2
+            # 留出余量，避免在两个比例之间来回切换
+            if predicted < self.budget * 0.8:
+                self.level -= 1
+                self.avg_time = predicted
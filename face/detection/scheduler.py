@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+import numpy as np
+from detection.encoding import batch_image_encodings
+from detection.face_detector import FaceResult
+from utils.metrics import NULL_METRICS
+
+
+# 推理调度器：多个调用方（各路摄像头、离线任务、登记界面）提交人脸图片，立即拿到 Future；
+# 调度线程把短时间内到达的请求攒成一批，一次编码、一次与人脸库比对。
+# 每批最多 max_batch_size 个请求，最早的请求最多等 max_wait_ms 毫秒；
+# 等待中的请求超过 max_queue 个时提交方被阻塞（背压），不会无限堆积
+class BatchScheduler(threading.Thread):
+    def __init__(self, face_recognizer, max_batch_size=16, max_wait_ms=5, max_queue=256, metrics=None,
+                 latency_window=1000):
+        super().__init__(daemon=True)
+        self.face_recognizer = face_recognizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or NULL_METRICS
+        self.requests = queue.Queue(maxsize=max_queue)  # (图片, 人脸位置, Future, 提交时间)
+        self.batch_sizes = Counter()  # 批大小 -> 批数
+        self.latencies = deque(maxlen=latency_window)  # 最近请求从提交到完成的耗时（秒）
+        self.completed = 0
+        self.rejected = 0  # 队列满、提交失败的请求数
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def submit(self, rgb_image, location=None, block=True, timeout=None):
+        """
+        提交一张 RGB 图片中的一张人脸，location 为 (top, right, bottom, left)，None 表示整张图片就是人脸截图。
+        返回 Future，结果为 FaceResult（track_id 为 None）。
+        队列已满时等待空位；block 为 False 或等待 timeout 秒后仍满时抛出 queue.Full
+        """
+        if self.stop_event.is_set():
+            raise RuntimeError("推理调度器已停止")
+        if location is None:
+            height, width = rgb_image.shape[:2]
+            location = (0, width, height, 0)
+        future = Future()
+        try:
+            self.requests.put((rgb_image, location, future, time.perf_counter()), block, timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise
+        return future
+
+    def identify(self, rgb_image, location=None, timeout=None):
+        """同步接口：提交并等待结果"""
+        return self.submit(rgb_image, location).result(timeout)
+
+    def run(self):
+        # 停止后先处理完队列中剩余的请求再退出
+        while not self.stop_event.is_set() or not self.requests.empty():
+            batch = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _collect(self):
+        try:
+            first = self.requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        # 从最早的请求提交时算起最多等 max_wait；它已经在队列中等过了（调度器忙）就只取已到达的请求
+        deadline = first[3] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch):
+        # 调用方已取消的请求不再计算
+        batch = [request for request in batch if request[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        images, locations, futures, submitted = zip(*batch)
+        self.metrics.set_gauge("scheduler_queue", self.requests.qsize())
+        try:
+            with self.metrics.timer("batch_encode"):
+                encodings = batch_image_encodings(images, locations)
+            matches = self.face_recognizer.match_encodings(encodings)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        for location, future, (name, distance, image) in zip(locations, futures, matches):
+            future.set_result(FaceResult(location, name, distance, None, image))
+        with self.lock:
+            self.batch_sizes[len(batch)] += 1
+            self.completed += len(batch)
+            for started in submitted:
+                self.latencies.append(finished - started)
+                self.metrics.record("request_latency", finished - started)
+
+    def stats(self):
+        """当前队列长度、已完成请求数、批大小分布，以及最近请求延迟的分位数（毫秒）"""
+        with self.lock:
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+            latencies = np.array(self.latencies) * 1000
+            completed = self.completed
+        batches = sum(batch_sizes.values())
+        stats = {
+            "queue_depth": self.requests.qsize(),
+            "completed": completed,
+            "rejected": self.rejected,
+            "batches": batches,
+            "mean_batch_size": round(completed / batches, 2) if batches else None,
+            "batch_size_histogram": batch_sizes,
+        }
+        if len(latencies):
+            stats["latency_ms"] = {
+                "p50": round(float(np.percentile(latencies, 50)), 3),
+                "p95": round(float(np.percentile(latencies, 95)), 3),
+                "p99": round(float(np.percentile(latencies, 99)), 3),
+                "max": round(float(latencies.max()), 3),
+            }
+        return stats
+
+    def stop(self):
+        self.stop_event.set()
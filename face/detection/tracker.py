@@ -0,0 +1,137 @@
+from collections import Counter, deque
+import cv2
+import numpy as np
+
+UNKNOWN = "unknow"
+
+
+def iou(a, b):
+    """两个人脸框 (top, right, bottom, left) 的交并比"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+# 单个人脸轨迹
+class Track:
+    def __init__(self, track_id, box, vote_window):
+        self.track_id = track_id
+        self.box = box
+        self.votes = deque(maxlen=vote_window)  # 最近若干次识别的 (姓名, 距离, 图片路径)
+        self.missed = 0  # 连续未被检测到的帧数
+        self.frames_since_encode = None  # None 表示还没有编码过
+        self.template = None  # 用于帧间跟踪的灰度模板
+        self.gallery_version = 0  # 投票所依据的人脸库版本
+
+    def vote(self, name, distance, image, gallery_version=0):
+        # 人脸库更新后，旧库的投票作废
+        if gallery_version != self.gallery_version:
+            self.votes.clear()
+            self.gallery_version = gallery_version
+        self.votes.append((name, distance, image))
+        self.frames_since_encode = 0
+
+    @property
+    def identity(self):
+        """多帧投票得到的 (姓名, 最近一次距离, 图片路径)，票数相同时取平均距离更小的"""
+        if not self.votes:
+            return None, None, None
+        counts = Counter(name for name, _, _ in self.votes)
+        best = min(counts, key=lambda n: (-counts[n], np.mean([d for name, d, _ in self.votes if name == n])))
+        distance, image = next((d, image) for name, d, image in reversed(self.votes) if name == best)
+        return best, distance, image
+
+
+# 人脸跟踪器：每隔 detect_interval 帧做一次检测并按 IoU 关联轨迹，中间帧用模板匹配跟踪；
+# 只有新轨迹或距上次编码超过 reencode_interval 帧的轨迹才需要重新计算编码
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_missed=5, detect_interval=3, reencode_interval=15,
+                 vote_window=15, match_threshold=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.detect_interval = detect_interval
+        self.reencode_interval = reencode_interval
+        self.vote_window = vote_window
+        self.match_threshold = match_threshold  # 模板匹配得分低于此值视为跟丢
+        self.tracks = []
+        self.next_id = 1
+        self.frame_index = 0
+        self.gallery_version = 0  # 人脸库每次热更新后加一，所有轨迹随之重新编码
+
+    def should_detect(self):
+        # 没有轨迹时每帧都检测，以便尽快发现新出现的人脸
+        return not self.tracks or self.frame_index % self.detect_interval == 0
+
+    def update(self, gray, locations):
+        """用检测结果更新轨迹，返回当前可见的轨迹"""
+        self.frame_index += 1
+        pairs = sorted(((iou(track.box, box), t, d) for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(locations)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            track = self.tracks[t]
+            track.box = locations[d]
+            track.missed = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+
+        for d, box in enumerate(locations):
+            if d not in matched_boxes:
+                self.tracks.append(Track(self.next_id, box, self.vote_window))
+                self.next_id += 1
+
+        return self._finish_step(gray)
+
+    def follow(self, gray):
+        """不做检测，用模板匹配把每条轨迹移动到新位置"""
+        self.frame_index += 1
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            if track.missed or track.template is None:
+                track.missed += 1
+                continue
+            top, right, bottom, left = track.box
+            box_h, box_w = bottom - top, right - left
+            # 在原位置周围半个人脸大小的范围内搜索
+            y0, y1 = max(top - box_h // 2, 0), min(bottom + box_h // 2, height)
+            x0, x1 = max(left - box_w // 2, 0), min(right + box_w // 2, width)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < track.template.shape[0] or window.shape[1] < track.template.shape[1]:
+                track.missed += 1
+                continue
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.match_threshold:
+                track.missed += 1
+                continue
+            track.box = (y0 + dy, x0 + dx + box_w, y0 + dy + box_h, x0 + dx)
+        return self._finish_step(gray)
+
+    def needs_encoding(self, track):
+        return (track.frames_since_encode is None or track.frames_since_encode >= self.reencode_interval
+                or track.gallery_version != self.gallery_version)
+
+    def _finish_step(self, gray):
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        visible = []
+        for track in self.tracks:
+            if track.frames_since_encode is not None:
+                track.frames_since_encode += 1
+            if track.missed == 0:
+                top, right, bottom, left = track.box
+                if bottom > top and right > left:
+                    track.template = gray[top:bottom, left:right].copy()
+                visible.append(track)
+        return visible
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from detection.face_detector import FaceRecognizer
+from detection.gallery import FaceGallery
+
+# 子进程内的识别器和共享内存句柄，由 _init_worker 在进程启动时创建
+_worker_recognizer = None
+_worker_shm = None
+
+
+def _init_worker(shm_name, shape, dtype, names, images, recognizer_kwargs):
+    global _worker_recognizer, _worker_shm
+    # 人脸库矩阵直接映射主进程的共享内存，不复制；量化后端压缩过的人脸库为 float16
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    encodings = np.ndarray(shape, dtype=dtype, buffer=_worker_shm.buf)
+    gallery = FaceGallery.from_matrix(encodings, names, images)
+    _worker_recognizer = FaceRecognizer(gallery=gallery, **recognizer_kwargs)
+
+
+def worker_recognizer():
+    """子进程中的识别器，供通过 submit_task 提交的任务函数使用"""
+    return _worker_recognizer
+
+
+def _identify(seq, timestamp, frame):
+    faces, recognized_name, recognized_image = _worker_recognizer.identify(frame, rgb=True)
+    return seq, timestamp, faces, recognized_name, recognized_image
+
+
+# 多进程识别池：每个子进程持有一个识别器，人脸库编码矩阵通过共享内存共用
+class RecognitionPool:
+    def __init__(self, face_recognizer, num_workers=None):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        gallery = face_recognizer.gallery
+        matrix = gallery.matrix
+
+        # 共享内存大小不能为 0，人脸库为空时也至少申请 1 字节
+        self.shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        shared = np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=self.shm.buf)
+        shared[:] = matrix
+
+        # 子进程识别器沿用主进程识别器的参数；帧会分散到不同进程，子进程中不做跟踪。
+        # 索引已由主进程建好并保存，子进程只读取，失效时各自在内存中重建，不会同时写同一个文件
+        recognizer_kwargs = {
+            "tolerance": face_recognizer.tolerance,
+            "matcher": face_recognizer.matcher_name,
+            "matcher_params": face_recognizer.matcher_params,
+            "index_path": face_recognizer.index_path,
+            "save_index": False,
+            "detector": face_recognizer.detector_name,
+            "detector_params": face_recognizer.detector_params,
+            "detection_scale": face_recognizer.detection_scale,
+            "latency_budget_ms": face_recognizer.latency_budget_ms,
+        }
+
+        # 用 spawn 启动子进程，避免在已有 Qt 线程的进程里 fork
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.shm.name, matrix.shape, matrix.dtype.str, gallery.names, gallery.images, recognizer_kwargs))
+
+    def submit(self, seq, timestamp, frame):
+        """提交一帧 RGB 画面，返回的 future 结果为 (帧序号, 时间戳, 人脸列表, 姓名, 图片路径)"""
+        return self.executor.submit(_identify, seq, timestamp, frame)
+
+    def submit_task(self, fn, *args):
+        """在子进程中执行模块级函数 fn，fn 内可通过 worker_recognizer() 取得识别器"""
+        return self.executor.submit(fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.shm.close()
+        self.shm.unlink()
@@ -1,9 +1,12 @@
+from utils.startup import STARTUP  # 最先导入，作为启动计时的起点
 from PyQt5.QtWidgets import QApplication
 from ui.main_window import MainWindow
 import sys
 
 if __name__ == "__main__":
+    STARTUP.mark("imports")
     app = QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
+    STARTUP.mark("window_shown")
     sys.exit(app.exec_())
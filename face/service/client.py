@@ -0,0 +1,160 @@
+"""
+识别服务客户端：一个 RecognitionClient 对应一条持久连接，请求依次复用这条连接。
+命令行用法（在 face 目录下）:
+  python -m service.client identify photo.jpg
+  python -m service.client enroll 张三 photo.jpg
+  python -m service.client remove 张三
+  python -m service.client stats
+"""
+import argparse
+import asyncio
+import json
+import sys
+from urllib.parse import quote
+from service.protocol import ProtocolError, is_chunked, read_body, read_chunk, read_head, write_chunk, write_head
+import config
+
+MAX_RESPONSE_BYTES = 64 << 20
+
+
+class RecognitionClient:
+    def __init__(self, host=None, port=None):
+        self.host = host or config.SERVICE["host"]
+        self.port = port or config.SERVICE["port"]
+        self.reader = None
+        self.writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def connect(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", content_type="application/octet-stream"):
+        """发送一个请求并读取响应，返回 (状态码, JSON 内容)；服务端要求关闭连接时下次请求自动重连"""
+        await self.connect()
+        headers = {"Host": f"{self.host}:{self.port}", "Content-Length": len(body)}
+        if body:
+            headers["Content-Type"] = content_type
+        write_head(self.writer, f"{method} {path} HTTP/1.1", headers)
+        self.writer.write(body)
+        await self.writer.drain()
+
+        start, response_headers = await read_head(self.reader)
+        if start is None:
+            await self.close()
+            raise ConnectionError("服务端关闭了连接")
+        payload = json.loads(await read_body(self.reader, response_headers, MAX_RESPONSE_BYTES) or b"null")
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(start[1]), payload
+
+    async def identify(self, image_bytes):
+        return await self.request("POST", "/identify", image_bytes, "image/jpeg")
+
+    async def enroll(self, name, image_bytes):
+        return await self.request("POST", f"/persons/{quote(name, safe='')}", image_bytes, "image/jpeg")
+
+    async def remove(self, name):
+        return await self.request("DELETE", f"/persons/{quote(name, safe='')}")
+
+    async def persons(self):
+        return await self.request("GET", "/persons")
+
+    async def stats(self):
+        return await self.request("GET", "/stats")
+
+    async def stream(self, frames):
+        """
+        在当前连接上发送一串图片（JPEG/PNG 字节），边发送边逐帧产生服务端返回的结果字典。
+        frames 可以是普通迭代器，也可以是异步迭代器（例如从摄像头实时读取）
+        """
+        await self.connect()
+        write_head(self.writer, "POST /stream HTTP/1.1", {"Host": f"{self.host}:{self.port}",
+                                                          "Content-Type": "application/octet-stream",
+                                                          "Transfer-Encoding": "chunked"})
+
+        async def send():
+            if hasattr(frames, "__aiter__"):
+                async for frame in frames:
+                    write_chunk(self.writer, frame)
+                    await self.writer.drain()
+            else:
+                for frame in frames:
+                    write_chunk(self.writer, frame)
+                    await self.writer.drain()
+            write_chunk(self.writer, b"")
+            await self.writer.drain()
+
+        sender = asyncio.create_task(send())
+        try:
+            start, headers = await read_head(self.reader)
+            if start is None:
+                raise ConnectionError("服务端关闭了连接")
+            if int(start[1]) != 200 or not is_chunked(headers):
+                error = json.loads(await read_body(self.reader, headers, MAX_RESPONSE_BYTES) or b"null")
+                raise ProtocolError(f"识别流被拒绝: {error}", int(start[1]))
+            while True:
+                chunk = await read_chunk(self.reader, MAX_RESPONSE_BYTES)
+                if chunk is None:
+                    break
+                yield json.loads(chunk)
+            await sender
+        finally:
+            if not sender.done():
+                # 提前结束（调用方不再读取或出错），连接状态不确定，直接关闭
+                sender.cancel()
+                await self.close()
+
+
+async def run_command(args):
+    async with RecognitionClient(args.host, args.port) as client:
+        if args.command == "identify":
+            with open(args.image, "rb") as f:
+                status, payload = await client.identify(f.read())
+        elif args.command == "enroll":
+            with open(args.image, "rb") as f:
+                status, payload = await client.enroll(args.name, f.read())
+        elif args.command == "remove":
+            status, payload = await client.remove(args.name)
+        elif args.command == "persons":
+            status, payload = await client.persons()
+        else:
+            status, payload = await client.stats()
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+    return 0 if status == 200 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="人脸识别服务客户端")
+    parser.add_argument("--host", default=config.SERVICE["host"])
+    parser.add_argument("--port", type=int, default=config.SERVICE["port"])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    identify_parser = subparsers.add_parser("identify", help="识别一张图片")
+    identify_parser.add_argument("image")
+    enroll_parser = subparsers.add_parser("enroll", help="登记人脸")
+    enroll_parser.add_argument("name")
+    enroll_parser.add_argument("image")
+    remove_parser = subparsers.add_parser("remove", help="删除人员")
+    remove_parser.add_argument("name")
+    subparsers.add_parser("persons", help="列出人员")
+    subparsers.add_parser("stats", help="服务统计")
+    return asyncio.run(run_command(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
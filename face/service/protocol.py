@@ -0,0 +1,103 @@
+import json
+
+# 识别服务使用的 HTTP/1.1 子集：默认保持连接（keep-alive），请求体用 Content-Length 或分块传输（chunked），
+# 流式接口的每个分块是一帧图片，响应的每个分块是一行 JSON 结果
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           415: "Unsupported Media Type", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+MAX_HEADER_LINES = 100
+
+
+class ProtocolError(ValueError):
+    """请求或响应格式不正确，或超出大小限制；status 为应返回的状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_head(reader):
+    """读取起始行和头部，返回 (起始行各部分, {小写头部名: 值})；连接已关闭时返回 (None, None)"""
+    line = await reader.readline()
+    if not line:
+        return None, None
+    start = line.decode("latin-1").strip().split(" ", 2)
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return start, headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise ProtocolError("头部过多")
+
+
+def is_chunked(headers):
+    return headers.get("transfer-encoding", "").lower() == "chunked"
+
+
+def parse_length(text, base=10):
+    """解析 Content-Length（十进制）或分块大小（十六进制），不是非负整数时抛出 ProtocolError"""
+    text = text.strip()
+    # int() 还接受负号、正号、下划线和 0x 前缀，这里只允许数字
+    digits = "0123456789abcdefABCDEF" if base == 16 else "0123456789"
+    if not text or len(text) > 16 or any(c not in digits for c in text):
+        raise ProtocolError(f"长度不合法: {text!r}")
+    return int(text, base)
+
+
+async def read_body(reader, headers, max_bytes):
+    """读取 Content-Length 给出的完整消息体（分块传输的消息体用 read_chunk 逐块读取）"""
+    length = parse_length(headers.get("content-length", "0"))
+    if length > max_bytes:
+        raise ProtocolError(f"消息体超过 {max_bytes} 字节", 413)
+    return await reader.readexactly(length) if length else b""
+
+
+async def read_chunk(reader, max_bytes):
+    """读取一个分块，遇到结束分块时返回 None"""
+    size_line = await reader.readline()
+    if not size_line:
+        raise ProtocolError("分块传输意外结束")
+    size = parse_length(size_line.split(b";", 1)[0].decode("latin-1"), 16)
+    if size > max_bytes:
+        raise ProtocolError(f"分块超过 {max_bytes} 字节", 413)
+    if size == 0:
+        # 结束分块之后可能有尾部头部，读到空行为止
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return None
+    data = await reader.readexactly(size)
+    await reader.readexactly(2)  # 分块末尾的 \r\n
+    return data
+
+
+def write_chunk(writer, data):
+    """写入一个分块，data 为空时写入结束分块"""
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+def write_head(writer, start_line, headers):
+    lines = [start_line] + [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+def write_response(writer, status, body=b"", content_type="application/json", keep_alive=True, headers=None):
+    head = {"Content-Type": content_type, "Content-Length": len(body),
+            "Connection": "keep-alive" if keep_alive else "close"}
+    head.update(headers or {})
+    write_head(writer, f"HTTP/1.1 {status} {REASONS.get(status, '')}", head)
+    writer.write(body)
+
+
+def write_json(writer, status, payload, keep_alive=True, headers=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    write_response(writer, status, body, "application/json; charset=utf-8", keep_alive, headers)
+
+
+def wants_keep_alive(version, headers):
+    # HTTP/1.1 默认保持连接，HTTP/1.0 需要显式要求
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
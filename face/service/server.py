@@ -0,0 +1,431 @@
+"""
+无界面的人脸识别服务：多台签到机、后台工具共用一个识别节点，不必各自加载识别器和人脸库。
+在 face 目录下运行: python -m service.server --port 8765
+
+接口（HTTP/1.1，默认保持连接）:
+  POST   /identify          请求体为一张 JPEG/PNG 图片，返回画面中全部人脸的识别结果
+  POST   /stream            分块传输，每个分块一帧图片；响应也是分块传输，每帧一行 JSON 结果。
+                            同一条流内开启人脸跟踪（config.TRACKING）和编码备忘（config.ENCODING_MEMO），
+                            连接在流结束后可以继续使用
+  GET    /persons           人脸库中的全部人员
+  POST   /persons/{姓名}    登记一张人脸图片，未通过质量检查时返回 422
+  DELETE /persons/{姓名}    删除该人员的全部登记图片
+  GET    /stats             调度器队列长度、批大小分布和请求延迟
+  GET    /health
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+import cv2
+import numpy as np
+from detection.encoding_memo import perceptual_hash
+from detection.enrollment import images_of
+from detection.face_detector import FaceRecognizer, FaceResult
+from detection.gallery import FaceGallery
+from detection.scheduler import BatchScheduler
+from service.protocol import (ProtocolError, is_chunked, read_body, read_chunk, read_head, wants_keep_alive,
+                              write_chunk, write_head, write_json)
+import config
+
+
+def face_to_dict(face):
+    return {
+        "box": list(face.box),
+        "name": face.name,
+        "distance": None if face.distance is None or face.distance == float("inf") else round(face.distance, 4),
+        "track_id": face.track_id,
+        "image": face.image,
+    }
+
+
+def decode_image(data):
+    """解码 JPEG/PNG 等图片为 BGR 数组，无法解码时抛出 ProtocolError"""
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ProtocolError("无法解码图片", 415)
+    return frame
+
+
+def decode_rgb(data):
+    return cv2.cvtColor(decode_image(data), cv2.COLOR_BGR2RGB)
+
+
+# 检测子进程内的识别器（只用来检测人脸位置，人脸库为空），由 _init_detector 在进程启动时创建
+_detector = None
+
+
+def _init_detector(recognizer_kwargs):
+    global _detector
+    _detector = FaceRecognizer(gallery=FaceGallery(capacity=1), **recognizer_kwargs)
+
+
+def _detect(rgb_frame, keep=()):
+    return _detector.detect_faces(rgb_frame, keep)
+
+
+def face_hashes(rgb_frame, locations):
+    return [perceptual_hash(rgb_frame, location) for location in locations]
+
+
+def valid_person_name(name):
+    # 姓名直接用作文件名，不能含路径分隔符，也不能是隐藏文件
+    return bool(name) and not name.startswith(".") and "/" not in name and "\\" not in name
+
+
+# 识别服务：事件循环只负责收发，图片解码和登记交给线程池；
+# 人脸检测交给检测进程池，每个子进程持有自己的检测器（检测器和自适应缩放都不是线程安全的，dlib 检测也不释放 GIL）；
+# 各连接的人脸统一交给推理调度器攒批编码和比对，调度器满时返回 503（背压）
+class RecognitionService:
+    def __init__(self, face_recognizer, scheduler, workers=4, max_body_mb=20):
+        self.face_recognizer = face_recognizer
+        self.scheduler = scheduler
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        detector_kwargs = {
+            "detector": face_recognizer.detector_name,
+            "detector_params": face_recognizer.detector_params,
+            "detection_scale": face_recognizer.detection_scale,
+            "latency_budget_ms": face_recognizer.latency_budget_ms,
+        }
+        # 与识别池一样用 spawn 启动子进程
+        self.detect_executor = ProcessPoolExecutor(max_workers=workers,
+                                                   mp_context=multiprocessing.get_context("spawn"),
+                                                   initializer=_init_detector, initargs=(detector_kwargs,))
+        self.max_body = int(max_body_mb * (1 << 20))
+        self.gallery_lock = None  # 登记和删除串行执行，在事件循环中创建
+        self.connections = 0
+        self.requests = 0
+
+    async def start(self, host, port):
+        self.gallery_lock = asyncio.Lock()
+        self.scheduler.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.scheduler.stop()
+        self.scheduler.join()
+        self.executor.shutdown(wait=True)
+        self.detect_executor.shutdown(wait=True, cancel_futures=True)
+
+    async def run_in_pool(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def detect(self, rgb_frame, keep=()):
+        """在检测进程池中检测人脸位置，keep 为总是参与检测的区域（已有轨迹的位置）"""
+        return await asyncio.get_running_loop().run_in_executor(self.detect_executor, _detect, rgb_frame, keep)
+
+    async def match(self, rgb_frame, locations):
+        """把一帧中的人脸交给推理调度器，返回 FaceResult 列表；队列已满时取消已提交的部分并抛出 queue.Full"""
+        futures = []
+        try:
+            for location in locations:
+                futures.append(self.scheduler.submit(rgb_frame, location, block=False))
+        except queue.Full:
+            # 已提交的部分也取消，调度器会跳过它们
+            for future in futures:
+                future.cancel()
+            raise
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    async def match_memo(self, recognizer, rgb_frame, locations):
+        """
+        流中的一帧：先查这条流的编码备忘，只把没命中的人脸交给推理调度器，调度器的比对结果存入备忘。
+        调度器不返回编码，命中的条目如果是旧人脸库的结果，无法用缓存的编码重新比对，也重新提交
+        """
+        memo = recognizer.encoding_memo
+        if memo is None or not locations:
+            return await self.match(rgb_frame, locations)
+
+        matcher = recognizer.matcher
+        now = time.monotonic()
+        hashes = await self.run_in_pool(face_hashes, rgb_frame, locations)
+        found = [memo.lookup(frame_hash, location, now) for frame_hash, location in zip(hashes, locations)]
+        faces = [None] * len(locations)
+        misses = [i for i, entry in enumerate(found) if entry is None or entry[3] is not matcher]
+        if misses:
+            start = time.perf_counter()
+            matched = await self.match(rgb_frame, [locations[i] for i in misses])
+            memo.record_encode_time((time.perf_counter() - start) / len(misses))
+            for i, face in zip(misses, matched):
+                faces[i] = face
+                match = (face.name, face.distance, face.image)
+                if found[i] is None:
+                    memo.store(hashes[i], locations[i], None, match, matcher, now)
+                else:
+                    memo.update_match(found[i][0], match, matcher)
+        for i, entry in enumerate(found):
+            if faces[i] is None:
+                name, distance, image = entry[2]
+                faces[i] = FaceResult(locations[i], name, distance, None, image)
+        return faces
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            keep_alive = True
+            while keep_alive:
+                start, headers = await read_head(reader)
+                if start is None:
+                    break
+                if len(start) != 3:
+                    write_json(writer, 400, {"error": "请求行格式不正确"}, keep_alive=False)
+                    break
+                method, target, version = start
+                keep_alive = wants_keep_alive(version, headers)
+                self.requests += 1
+                try:
+                    keep_alive = await self.dispatch(method, urlsplit(target).path, headers, reader, writer,
+                                                     keep_alive)
+                except ProtocolError as e:
+                    # 请求体可能没有读完，连接无法继续复用
+                    keep_alive = False
+                    write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # 读取请求或写入响应时的意外错误：返回 500 并关闭连接，不让连接无响应地断开
+                    print(f"处理请求 {method} {target} 出错: {e!r}")
+                    keep_alive = False
+                    write_json(writer, 500, {"error": "服务内部错误"}, keep_alive=False)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def dispatch(self, method, path, headers, reader, writer, keep_alive):
+        """处理一个请求并写入响应，返回连接是否可以继续使用"""
+        if path == "/stream" and method == "POST":
+            return await self.stream(headers, reader, writer, keep_alive)
+
+        body = b""
+        if is_chunked(headers):
+            raise ProtocolError("只有 /stream 接受分块传输")
+        if method in ("POST", "PUT"):
+            body = await read_body(reader, headers, self.max_body)
+
+        try:
+            status, payload = await self.route(method, path, body)
+        except ProtocolError as e:
+            # 请求体已经读完（例如图片无法解码），连接可以继续使用
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            # 识别或人脸库操作的意外错误只影响本次请求
+            print(f"处理请求 {method} {path} 出错: {e!r}")
+            status, payload = 500, {"error": "服务内部错误"}
+        headers = {"Retry-After": 1} if status == 503 else None
+        write_json(writer, status, payload, keep_alive, headers)
+        return keep_alive
+
+    async def route(self, method, path, body):
+        if path == "/identify" and method == "POST":
+            status, payload = await self.identify(body)
+        elif path.startswith("/persons/") and method in ("POST", "DELETE"):
+            name = unquote(path[len("/persons/"):])
+            if not valid_person_name(name):
+                status, payload = 400, {"error": f"姓名不合法: {name}"}
+            elif method == "POST":
+                status, payload = await self.enroll(name, body)
+            else:
+                status, payload = await self.remove(name)
+        elif path == "/persons" and method == "GET":
+            gallery = self.face_recognizer.gallery
+            status, payload = 200, {"persons": sorted(set(gallery.names)), "templates": len(gallery)}
+        elif path == "/stats" and method == "GET":
+            status, payload = 200, {"scheduler": self.scheduler.stats(), "connections": self.connections,
+                                    "requests": self.requests, "gallery_size": len(self.face_recognizer.gallery)}
+        elif path == "/health" and method == "GET":
+            status, payload = 200, {"status": "ok"}
+        elif path in ("/identify", "/stream", "/persons", "/stats", "/health") or path.startswith("/persons/"):
+            status, payload = 405, {"error": f"{path} 不支持 {method}"}
+        else:
+            status, payload = 404, {"error": f"未知接口: {path}"}
+        return status, payload
+
+    async def identify(self, data):
+        start = time.perf_counter()
+        rgb_frame = await self.run_in_pool(decode_rgb, data)
+        try:
+            faces = await self.match(rgb_frame, await self.detect(rgb_frame))
+        except queue.Full:
+            return 503, {"error": "识别队列已满，请稍后重试"}
+        return 200, {"faces": [face_to_dict(face) for face in faces],
+                     "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    async def identify_tracked(self, recognizer, rgb_frame):
+        """
+        识别流中的一帧：与 FaceRecognizer.identify_tracked 相同的跟踪流程，
+        检测和编码比对改走检测进程池和推理调度器，与 /identify 共用；编码前先查这条流的编码备忘
+        """
+        tracker = recognizer.tracker
+        if tracker is None:
+            return await self.match_memo(recognizer, rgb_frame, await self.detect(rgb_frame))
+
+        gray = await self.run_in_pool(cv2.cvtColor, rgb_frame, cv2.COLOR_RGB2GRAY)
+        if tracker.should_detect():
+            locations = await self.detect(rgb_frame, [track.box for track in tracker.tracks])
+            tracks = await self.run_in_pool(tracker.update, gray, locations)
+        else:
+            tracks = await self.run_in_pool(tracker.follow, gray)
+
+        stale_tracks = [track for track in tracks if tracker.needs_encoding(track)]
+        # 人脸库版本在提交前取，比对期间人脸库被替换时这些轨迹下一帧会重新编码
+        gallery_version = tracker.gallery_version
+        try:
+            matches = await self.match_memo(recognizer, rgb_frame, [track.box for track in stale_tracks])
+        except queue.Full:
+            # 调度器繁忙时本帧只返回跟踪结果，待编码的轨迹留到后续帧
+            matches = []
+        for track, face in zip(stale_tracks, matches):
+            track.vote(face.name, face.distance, face.image, gallery_version)
+        return [FaceResult(track.box, *track.identity[:2], track.track_id, track.identity[2]) for track in tracks]
+
+    async def stream(self, headers, reader, writer, keep_alive):
+        if not is_chunked(headers):
+            raise ProtocolError("/stream 需要分块传输（Transfer-Encoding: chunked）")
+        write_head(writer, "HTTP/1.1 200 OK", {"Content-Type": "application/x-ndjson; charset=utf-8",
+                                               "Transfer-Encoding": "chunked",
+                                               "Connection": "keep-alive" if keep_alive else "close"})
+        # 每条流一个识别器：人脸库共用，跟踪状态独立；帧按顺序处理，客户端发得太快时由 TCP 自然限速
+        recognizer = self.face_recognizer.for_source()
+        try:
+            seq = 0
+            while True:
+                try:
+                    data = await read_chunk(reader, self.max_body)
+                except ProtocolError as e:
+                    # 响应已经开始，无法再返回错误状态码，只能结束连接
+                    print(f"识别流中断: {e}")
+                    return False
+                if data is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    rgb_frame = await self.run_in_pool(decode_rgb, data)
+                    faces = await self.identify_tracked(recognizer, rgb_frame)
+                    result = {"seq": seq, "faces": [face_to_dict(face) for face in faces]}
+                except ProtocolError as e:
+                    result = {"seq": seq, "error": str(e)}  # 单帧解码失败不影响后续帧
+                except Exception as e:
+                    # 响应已经开始，意外错误也只作为这一帧的结果返回
+                    print(f"识别流第 {seq} 帧出错: {e!r}")
+                    result = {"seq": seq, "error": "服务内部错误"}
+                result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                write_chunk(writer, (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+                seq += 1
+            write_chunk(writer, b"")
+        finally:
+            self.face_recognizer.remove_source(recognizer)
+        return keep_alive
+
+    def save_enrollment(self, name, data):
+        # 线程池中执行：质量检查通过后保存到 known_faces/{姓名}/，只更新这个人的模板；返回 (保存路径, 不合格原因)
+        frame = decode_image(data)
+        encoding, reason = self.face_recognizer.enrollment.encode(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if reason:
+            return None, reason
+        folder = os.path.join(self.face_recognizer.known_faces_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        if data.startswith(b"\xff\xd8"):
+            extension, payload = ".jpg", data
+        elif data.startswith(b"\x89PNG"):
+            extension, payload = ".png", data
+        else:
+            # 其他格式（BMP、WebP 等）转成 PNG 保存，人脸库只读取 jpg/png
+            extension, payload = ".png", cv2.imencode(".png", frame)[1].tobytes()
+        base = os.path.join(folder, time.strftime("%Y%m%d_%H%M%S"))
+        path = base + extension
+        index = 1
+        while os.path.exists(path):
+            path = f"{base}-{index}{extension}"
+            index += 1
+        with open(path, "wb") as f:
+            f.write(payload)
+        # 质量检查时算出的编码直接写入编码缓存，不再重新编码
+        self.face_recognizer.update_person(name, {path: encoding})
+        return path, None
+
+    async def enroll(self, name, data):
+        async with self.gallery_lock:
+            path, reason = await self.run_in_pool(self.save_enrollment, name, data)
+        if reason:
+            return 422, {"error": reason}
+        return 200, {"name": name, "path": path, "gallery_size": len(self.face_recognizer.gallery)}
+
+    def delete_person(self, name):
+        # 线程池中执行：删除 {姓名}.jpg/.png 和 {姓名}/ 目录，从人脸库中去掉这个人；返回删除的图片数
+        known_faces_dir = self.face_recognizer.known_faces_dir
+        removed = images_of(known_faces_dir, name)
+        for path in removed:
+            os.remove(path)
+        folder = os.path.join(known_faces_dir, name)
+        if os.path.isdir(folder):
+            shutil.rmtree(folder)
+        if removed:
+            self.face_recognizer.update_person(name, removed_paths=removed)
+        return len(removed)
+
+    async def remove(self, name):
+        async with self.gallery_lock:
+            removed = await self.run_in_pool(self.delete_person, name)
+        if not removed:
+            return 404, {"error": f"人脸库中没有 {name}"}
+        return 200, {"name": name, "removed_images": removed, "gallery_size": len(self.face_recognizer.gallery)}
+
+
+def create_service(args):
+    face_recognizer = FaceRecognizer(known_faces_dir=args.known_faces,
+                                     tolerance=config.TOLERANCE,
+                                     matcher=config.MATCHER_BACKEND,
+                                     matcher_params=config.MATCHER_PARAMS.get(config.MATCHER_BACKEND),
+                                     index_path=config.MATCHER_INDEX_PATH,
+                                     detector=args.detector,
+                                     detector_params=config.DETECTOR_PARAMS.get(args.detector),
+                                     detection_scale=config.DETECTION_SCALE,
+                                     latency_budget_ms=config.DETECTION_LATENCY_BUDGET_MS,
+                                     tracking=config.TRACKING,
+                                     enrollment=config.ENROLLMENT,
+                                     encoding_memo=config.ENCODING_MEMO)
+    scheduler = BatchScheduler(face_recognizer, **config.INFERENCE_SCHEDULER)
+    return RecognitionService(face_recognizer, scheduler, args.workers, config.SERVICE["max_body_mb"])
+
+
+async def serve(args):
+    service = create_service(args)
+    try:
+        server = await service.start(args.host, args.port)
+        print(f"识别服务已启动: http://{args.host}:{args.port}，人脸库 {len(service.face_recognizer.gallery)} 人")
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="人脸识别服务")
+    parser.add_argument("--host", default=config.SERVICE["host"])
+    parser.add_argument("--port", type=int, default=config.SERVICE["port"])
+    parser.add_argument("--workers", type=int, default=config.SERVICE["workers"], help="解码线程数和检测进程数")
+    parser.add_argument("--known-faces", default=config.KNOWN_FACES_DIR, help="已知人脸目录")
+    parser.add_argument("--detector", default=config.DETECTOR_BACKEND, help="人脸检测后端")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
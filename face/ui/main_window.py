@@ -1,7 +1,11 @@
-from PyQt5.QtWidgets import QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QWidget
-from PyQt5.QtCore import Qt
+import math
+from PyQt5.QtWidgets import QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QGridLayout, QProgressBar, QWidget
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QImage, QPixmap
-from utils.video_capture import VideoCaptureThread
+from ui.thumbnail_cache import ThumbnailCache
+from utils.metrics import NULL_METRICS
+from utils.startup import STARTUP
+import config
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -19,9 +23,33 @@ class MainWindow(QMainWindow):
         self.label_title.setStyleSheet("font-size: 30px; solid blue; font-weight: bold;")
         left_layout.addWidget(self.label_title)
 
-        self.label_video = QLabel(self)
-        self.label_video.resize(640, 480)
-        left_layout.addWidget(self.label_video)
+        # 人脸库加载进度，加载期间已编码的人已经可以识别，加载完成后隐藏
+        self.gallery_progress = QProgressBar(self)
+        self.gallery_progress.setFormat("人脸库加载中 %v/%m")
+        self.gallery_progress.setRange(0, 0)  # 总数未知前显示为忙碌状态
+        left_layout.addWidget(self.gallery_progress)
+
+        # 每路视频一个画面，多路时按网格排列
+        source_count = max(1, len(config.CAMERA_SOURCES))
+        columns = math.ceil(math.sqrt(source_count))
+        video_grid = QGridLayout()
+        self.video_labels = []
+        for i in range(source_count):
+            label = QLabel(self)
+            if source_count == 1:
+                label.resize(640, 480)
+            else:
+                label.setMinimumSize(320, 240)
+                label.setAlignment(Qt.AlignCenter)
+            video_grid.addWidget(label, i // columns, i % columns)
+            self.video_labels.append(label)
+        self.label_video = self.video_labels[0]
+        left_layout.addLayout(video_grid)
+
+        # 画面中所有人脸的识别结果列表
+        self.label_faces = QLabel(self)
+        self.label_faces.setStyleSheet("font-size: 16px; font-weight: normal;")
+        left_layout.addWidget(self.label_faces)
 
         right_layout = QVBoxLayout()
 
@@ -43,45 +71,131 @@ class MainWindow(QMainWindow):
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
+        # 人员头像缩略图缓存，避免每次切换人员时解码原图
+        self.thumbnails = ThumbnailCache(config.THUMBNAIL_CACHE_DIR, config.THUMBNAIL_CACHE_SIZE)
+        self.portrait_path = None  # 当前显示的头像图片路径
+        self.source_faces = {}  # 视频源序号 -> 该路最近一次识别到的人脸
+
+        self.last_recognized_name = None  # 上次识别的人脸
+        self.thread = None
+        self.metrics = NULL_METRICS
+        self.label_metrics = None
+        # 识别相关模块（OpenCV、dlib）导入较慢，等窗口显示出来后再导入并启动采集线程
+        QTimer.singleShot(0, self.start_capture)
+
+    def start_capture(self):
+        with STARTUP.span("import_capture"):
+            from utils.video_capture import VideoCaptureThread
         self.thread = VideoCaptureThread()
         self.thread.change_pixmap_signal.connect(self.update_image)
         self.thread.face_frame_signal.connect(self.display_face_frame)
+        self.thread.faces_signal.connect(self.update_faces)
+        self.thread.gallery_progress_signal.connect(self.update_gallery_progress)
+        self.thread.gallery_ready_signal.connect(self.on_gallery_ready)
+        self.thread.gallery_reloaded_signal.connect(self.prune_thumbnails)
         self.thread.start()
 
-        self.last_recognized_name = None  # 上次识别的人脸
-
-    def update_image(self, q_img):
-        self.label_video.setPixmap(QPixmap.fromImage(q_img))
+        # 性能统计叠加层，显示在视频画面左上角
+        self.metrics = self.thread.metrics
+        if self.metrics.enabled and config.METRICS_OVERLAY:
+            self.label_metrics = QLabel(self.label_video)
+            self.label_metrics.setStyleSheet("background-color: rgba(0, 0, 0, 150); color: #00FF00; "
+                                             "font-family: monospace; font-size: 12px; padding: 4px;")
+            self.label_metrics.move(5, 5)
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(self.update_metrics_overlay)
+            self.metrics_timer.start(500)
+
+    def update_image(self, source, q_img, frame_buffer=None):
+        label = self.video_labels[source]
+        if STARTUP.mark("first_frame"):
+            self.check_startup()
+        with self.metrics.timer("paint"):
+            pixmap = QPixmap.fromImage(q_img)
+            if len(self.video_labels) > 1:
+                # 多路时缩放到网格单元大小，画面多、刷新快，用最近邻缩放
+                pixmap = pixmap.scaled(label.size(), Qt.KeepAspectRatio, Qt.FastTransformation)
+            label.setPixmap(pixmap)
+        # QPixmap 已复制了图像数据，归还帧缓冲区
+        if frame_buffer is not None:
+            frame_buffer.release()
+
+    def update_faces(self, source, faces):
+        from detection.face_detector import display_name
+        self.source_faces[source] = faces
+        faces = [face for source_faces in self.source_faces.values() for face in source_faces]
+        lines = []
+        for face in faces:
+            label = f"#{face.track_id} " if face.track_id is not None else ""
+            label += display_name(face.name)
+            if face.distance is not None and face.distance != float("inf"):
+                label += f"  ({face.distance:.2f})"
+            lines.append(label)
+        self.label_faces.setText(f"画面中人脸: {len(faces)}    " + "    ".join(lines))
+        # 画面中出现的人在后台预先生成头像缩略图，切换到该人员时直接使用
+        self.thumbnails.warm({face.image for face in faces if face.image}, self.label_topright.size())
+
+    def update_gallery_progress(self, done, total):
+        if STARTUP.mark("gallery_first_batch"):
+            self.check_startup()
+        self.gallery_progress.setRange(0, total)
+        self.gallery_progress.setValue(done)
+
+    def on_gallery_ready(self, size):
+        self.gallery_progress.hide()
+        self.prune_thumbnails()
+        STARTUP.mark("gallery_ready")
+        self.check_startup()
+
+    def prune_thumbnails(self, gallery_size=None):
+        # 人员删除或照片更换后，磁盘上对应的旧缩略图不再有用，在后台删除
+        from detection.face_detector import UNKNOWN_FACE_IMAGE
+        self.thumbnails.prune(self.thread.face_recognizer.known_faces_dir, self.label_topright.size(),
+                              extra_paths=[UNKNOWN_FACE_IMAGE])
+
+    def check_startup(self):
+        # 画面和人脸库都就绪后输出一次启动耗时报告
+        if STARTUP.reported or not STARTUP.has("first_frame", "gallery_ready"):
+            return
+        STARTUP.reported = True
+        print(STARTUP.report(config.STARTUP_TARGET_MS))
+        if config.STARTUP_PROFILE_PATH:
+            STARTUP.save(config.STARTUP_PROFILE_PATH, config.STARTUP_TARGET_MS)
+
+    def update_metrics_overlay(self):
+        self.label_metrics.setText(self.metrics.format_overlay())
+        self.label_metrics.adjustSize()
+        self.label_metrics.raise_()
 
     def display_face_frame(self, face_frame):
         # 如果传递的是空的图片，清空头像显示
         if face_frame.isNull():
-            self.label_topright.clear()  # 清空头像
-            self.label_info.setText("")  # 清空信息文本
+            self.clear_portrait()
         else:
-            # 获取粉红色背景板的尺寸
-            background_size = self.label_topright.size()
-
-            # 缩放人脸图片以适应背景板的大小
-            scaled_face_frame = face_frame.scaled(background_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
             # 获取当前识别的人脸名称
             current_recognized_name = self.thread.face_recognizer.recognized_name
 
             if current_recognized_name:
-                # 更新头像
-                known_face_pixmap = QPixmap(self.thread.face_recognizer.recognized_image)
-                scaled_known_face = known_face_pixmap.scaled(background_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.label_topright.setPixmap(scaled_known_face)
+                # 头像换了才更新，缩放好的头像从缓存中取，尺寸为粉红色背景板的大小
+                recognized_image = self.thread.face_recognizer.recognized_image
+                if recognized_image != self.portrait_path:
+                    self.portrait_path = recognized_image
+                    self.label_topright.setPixmap(self.thumbnails.pixmap(recognized_image, self.label_topright.size()))
 
                 # 更新信息文本
                 self.label_info.setText(self.thread.face_recognizer.recognized_info)
             else:
                 # 没有识别到人脸时，清空信息和头像
-                self.label_topright.clear()
-                self.label_info.setText("")  # 清空文本
+                self.clear_portrait()
+
+    def clear_portrait(self):
+        self.label_topright.clear()  # 清空头像
+        self.label_info.setText("")  # 清空信息文本
+        self.portrait_path = None
 
     def closeEvent(self, event):
-        self.thread.stop()
-        self.thread.wait()
+        if self.thread is not None:
+            self.thread.stop()
+            self.thread.wait()
+        self.thumbnails.close()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+
+IMAGE_EXTENSIONS = (".jpg", ".png")  # 与 known_faces 登记图片的扩展名一致
+
+# 人员头像缩略图缓存：按 (图片路径, 修改时间, 面板尺寸) 缓存缩放好的头像，
+# 内存中为有上限的 LRU，同时保存到磁盘，下次启动直接读取小图，不再解码几百万像素的原图；
+# 人脸库加载或更新后调用 prune 删除磁盘上已删除或已修改的图片对应的缩略图
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, capacity=64):
+        self.cache_dir = cache_dir  # 磁盘缓存目录，None 表示只缓存在内存中
+        self.capacity = capacity
+        self.images = OrderedDict()  # 键 -> 缩放后的 QImage，可在任意线程中使用
+        self.pixmaps = OrderedDict()  # 键 -> QPixmap，只能在界面线程中创建和使用
+        self.lock = threading.Lock()
+        self.warming = set()  # 正在后台生成的键，避免重复提交
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(image_path, size):
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            return None
+        return os.path.abspath(image_path), mtime, size.width(), size.height()
+
+    def disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.png")
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.capacity:
+            cache.popitem(last=False)
+
+    def image(self, image_path, size):
+        """返回缩放到 size 以内（保持比例）的 QImage，找不到图片时返回空 QImage；可在后台线程调用"""
+        key = self.key(image_path, size)
+        if key is None:
+            return QImage()
+        with self.lock:
+            if key in self.images:
+                self.images.move_to_end(key)
+                return self.images[key]
+
+        image = QImage()
+        if self.cache_dir and os.path.exists(self.disk_path(key)):
+            image = QImage(self.disk_path(key))
+        if image.isNull():
+            image = load_scaled(image_path, size)
+            if not image.isNull() and self.cache_dir:
+                image.save(self.disk_path(key), "PNG")
+
+        with self.lock:
+            self._remember(self.images, key, image)
+        return image
+
+    def pixmap(self, image_path, size):
+        """界面线程中取头像 QPixmap"""
+        key = self.key(image_path, size)
+        if key is None:
+            return QPixmap()
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(self.image(image_path, size))
+            self._remember(self.pixmaps, key, pixmap)
+        else:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def warm(self, image_paths, size):
+        """在后台线程中预先生成最近出现的人员的缩略图"""
+        for image_path in image_paths:
+            key = self.key(image_path, size)
+            with self.lock:
+                if key is None or key in self.images or key in self.warming:
+                    continue
+                self.warming.add(key)
+            self.executor.submit(self._warm_one, image_path, size, key)
+
+    def _warm_one(self, image_path, size, key):
+        try:
+            self.image(image_path, size)
+        finally:
+            with self.lock:
+                self.warming.discard(key)
+
+    def prune(self, source_dir, size, extra_paths=()):
+        """在后台线程中清理磁盘缓存：只保留 source_dir 下现有图片和 extra_paths 在 size 尺寸下的缩略图"""
+        if self.cache_dir:
+            self.executor.submit(self._prune, source_dir, size, list(extra_paths))
+
+    def _prune(self, source_dir, size, extra_paths):
+        image_paths = list(extra_paths)
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]  # 跳过缓存、索引等隐藏目录
+            image_paths += [os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+        keep = set()
+        for image_path in image_paths:
+            key = self.key(image_path, size)
+            if key is not None:
+                keep.add(os.path.basename(self.disk_path(key)))
+
+        removed = 0
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".png") and filename not in keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"已清理 {removed} 张过期的头像缩略图。")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def load_scaled(image_path, size):
+    """读取图片并缩放到 size 以内；大图让解码器直接按约两倍目标尺寸解码（JPEG 可以按比例解码），再平滑缩放"""
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    decode_size = QSize(size.width() * 2, size.height() * 2)
+    if source_size.isValid() and (source_size.width() > decode_size.width() or source_size.height() > decode_size.height()):
+        reader.setScaledSize(source_size.scaled(decode_size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    return image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
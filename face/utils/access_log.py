@@ -0,0 +1,249 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import cv2
+
+UNKNOWN = "unknow"
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+
+
+def safe_filename(text):
+    # 摄像头名称可能是网络流地址，姓名也可能含有文件名中不允许的字符
+    return re.sub(r"[\\/:*?\"<>|\x00-\x1f]", "_", str(text)).strip(" .") or "_"
+
+
+# 一次到访：同一个人（未识别的人按轨迹区分）连续出现期间的多次识别合并为一条记录
+class Visit:
+    def __init__(self, person, camera, timestamp, track_id):
+        self.person = person
+        self.camera = camera
+        self.track_id = track_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.best_distance = float("inf")
+        self.snapshot = None  # 距离最小的一次识别的人脸截图（RGB），由写入线程编码保存
+
+    def to_record(self):
+        return {
+            "person": self.person,
+            "camera": self.camera,
+            "track_id": self.track_id,
+            "first_seen": format_time(self.first_seen),
+            "last_seen": format_time(self.last_seen),
+            "best_distance": round(self.best_distance, 4) if self.best_distance != float("inf") else None,
+        }
+
+
+# SQLite 存储，WAL 模式下写入不阻塞读取，每批记录在一个事务中写入
+class SQLiteSink:
+    def __init__(self, path):
+        self.path = path
+        self.connection = None  # 在写入线程中创建，sqlite3 连接不能跨线程使用
+
+    def open(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS access_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                person TEXT NOT NULL,
+                camera TEXT,
+                track_id INTEGER,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                best_distance REAL,
+                snapshot TEXT
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_access_person ON access_events (person, first_seen)")
+        self.connection.commit()
+
+    def write(self, records):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO access_events (person, camera, track_id, first_seen, last_seen, best_distance, snapshot) "
+                "VALUES (:person, :camera, :track_id, :first_seen, :last_seen, :best_distance, :snapshot)", records)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+# 按天轮转的 JSONL 文件，单个文件超过 max_bytes 时再追加序号
+class JsonlSink:
+    def __init__(self, path, max_bytes=10 << 20):
+        self.directory = path
+        self.max_bytes = max_bytes
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def current_path(self):
+        day = datetime.now().strftime("%Y%m%d")
+        index = 0
+        while True:
+            suffix = f".{index}" if index else ""
+            path = os.path.join(self.directory, f"access_{day}{suffix}.jsonl")
+            if not os.path.exists(path) or os.path.getsize(path) < self.max_bytes:
+                return path
+            index += 1
+
+    def write(self, records):
+        with open(self.current_path(), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+
+    def close(self):
+        pass
+
+
+# 后台写入线程：从队列中攒批写入，磁盘 I/O 不会阻塞采集和显示循环
+class AccessLogWriter(threading.Thread):
+    def __init__(self, sink, snapshot_dir=None, batch_size=50, flush_interval=2.0, max_pending=10000):
+        super().__init__(daemon=True)
+        self.sink = sink
+        self.snapshot_dir = snapshot_dir  # 人脸截图保存目录，None 表示不保存
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # 不足一批时最长等待多少秒写入
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dropped = 0  # 队列满时丢弃的记录数
+        self.written = 0
+        self.stop_event = threading.Event()
+
+    def submit(self, visit):
+        try:
+            self.pending.put_nowait(visit)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        self.sink.open()
+        if self.snapshot_dir:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+        try:
+            while not self.stop_event.is_set() or not self.pending.empty():
+                batch = self._collect()
+                if not batch:
+                    continue
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # 写入线程退出后之后的到访都会丢失，这里只丢弃这一批
+                    print(f"到访记录写入出错，丢弃 {len(batch)} 条: {e!r}")
+        finally:
+            self.sink.close()
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=min(timeout, 0.2)))
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    break
+        return batch
+
+    def _write(self, batch):
+        records = []
+        for visit in batch:
+            record = visit.to_record()
+            try:
+                record["snapshot"] = self._save_snapshot(visit)
+            except (OSError, cv2.error) as e:
+                # 截图保存失败（磁盘已满等）时只记录到访，不影响其他记录
+                print(f"人脸截图保存失败: {e}")
+                record["snapshot"] = None
+            records.append(record)
+        try:
+            self.sink.write(records)
+            self.written += len(records)
+        except (OSError, sqlite3.Error) as e:
+            print(f"到访记录写入失败: {e}")
+
+    def _save_snapshot(self, visit):
+        if not self.snapshot_dir or visit.snapshot is None or visit.snapshot.size == 0:
+            return None
+        stamp = datetime.fromtimestamp(visit.first_seen).strftime("%Y%m%d_%H%M%S")
+        name = f"{stamp}_{safe_filename(visit.camera)}_{safe_filename(visit.person)}_{visit.track_id or 0}.jpg"
+        path = os.path.join(self.snapshot_dir, name)
+        # 中文路径下 cv2.imwrite 会失败，先编码再写文件
+        ok, data = cv2.imencode(".jpg", cv2.cvtColor(visit.snapshot, cv2.COLOR_RGB2BGR))
+        if not ok:
+            return None
+        with open(path, "wb") as f:
+            f.write(data.tobytes())
+        return path
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# 到访记录：把每帧的识别结果按人去抖，超过 visit_gap 秒没有再出现才结束一次到访并交给写入线程
+class AccessLog:
+    def __init__(self, writer, camera="0", visit_gap=10.0):
+        self.writer = writer
+        self.camera = camera
+        self.visit_gap = visit_gap
+        self.visits = {}  # 键 -> Visit；已识别的人按 (摄像头, 姓名) 合并，未识别的人按轨迹区分
+
+    def observe(self, faces, frame, timestamp=None, camera=None):
+        """记录一帧的识别结果（FaceResult 列表），frame 为该帧 RGB 画面，用于截取人脸；camera 默认为创建时给出的摄像头"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        camera = camera if camera is not None else self.camera
+        for face in faces:
+            if face.name is None:
+                continue  # 人脸库为空
+            # 同一人在不同摄像头前分别记录
+            key = (camera, face.name) if face.name != UNKNOWN else (camera, UNKNOWN, face.track_id)
+            visit = self.visits.get(key)
+            if visit is None:
+                visit = self.visits[key] = Visit(face.name, camera, timestamp, face.track_id)
+            visit.last_seen = timestamp
+            if face.distance is not None and face.distance < visit.best_distance:
+                visit.best_distance = face.distance
+                top, right, bottom, left = face.box
+                visit.snapshot = frame[top:bottom, left:right].copy()
+        self.expire(timestamp)
+
+    def expire(self, timestamp=None):
+        """结束超过 visit_gap 秒没有出现的到访"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        for key, visit in list(self.visits.items()):
+            if timestamp - visit.last_seen > self.visit_gap:
+                del self.visits[key]
+                self.writer.submit(visit)
+
+    def close(self):
+        """结束全部到访并等待写入完成"""
+        for visit in self.visits.values():
+            self.writer.submit(visit)
+        self.visits.clear()
+        self.writer.stop()
+        if self.writer.is_alive():
+            self.writer.join()
+
+
+def create_access_log(settings, camera="0"):
+    """按配置创建到访记录，settings 为 None 时返回 None；写入线程由调用方启动"""
+    if settings is None:
+        return None
+    if settings["backend"] == "sqlite":
+        sink = SQLiteSink(settings["path"])
+    elif settings["backend"] == "jsonl":
+        sink = JsonlSink(settings["path"], settings.get("max_bytes", 10 << 20))
+    else:
+        raise ValueError(f"未知的到访记录存储方式: {settings['backend']}，可选: sqlite, jsonl")
+    writer = AccessLogWriter(sink, settings.get("snapshot_dir"), settings.get("batch_size", 50),
+                             settings.get("flush_interval", 2.0))
+    return AccessLog(writer, camera, settings.get("visit_gap", 10.0))
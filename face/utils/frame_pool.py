@@ -0,0 +1,53 @@
+import threading
+import numpy as np
+
+
+# 帧缓冲区：由缓冲池预先分配，使用引用计数，所有使用者都释放后才回到池中复用
+class FrameBuffer:
+    def __init__(self, pool, array):
+        self.pool = pool
+        self.array = array
+        self.refs = 0
+
+    def retain(self, count=1):
+        with self.pool.lock:
+            self.refs += count
+        return self
+
+    def release(self, count=1):
+        with self.pool.lock:
+            self.refs -= count
+            if self.refs == 0:
+                self.pool.free.append(self)
+                self.pool.released.notify()
+
+
+# 固定数量的帧缓冲池，缓冲区全部在使用中时 acquire 最多等待 timeout 秒，仍没有空闲缓冲区则返回 None，由调用方丢帧
+class FramePool:
+    def __init__(self, shape, count=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)  # 有缓冲区回到池中时通知等待的 acquire
+        self.buffers = [FrameBuffer(self, np.empty(self.shape, dtype=dtype)) for _ in range(count)]
+        self.free = list(self.buffers)
+        self.misses = 0  # 因没有空闲缓冲区而丢弃的帧数
+
+    def acquire(self, refs=1, timeout=0):
+        with self.lock:
+            if not self.free and timeout:
+                self.released.wait_for(lambda: self.free, timeout)
+            if not self.free:
+                self.misses += 1
+                return None
+            buffer = self.free.pop()
+            buffer.refs = refs
+            return buffer
+
+    def in_use(self):
+        with self.lock:
+            return len(self.buffers) - len(self.free)
+
+
+def release_packet(packet):
+    """LatestQueue 丢弃旧帧时释放其中的缓冲区"""
+    packet[-1].release()
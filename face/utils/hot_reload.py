@@ -0,0 +1,58 @@
+import os
+import threading
+
+
+def dir_snapshot(path, extensions):
+    """目录（含子目录）中指定扩展名文件的 {相对路径: (大小, 修改时间)}"""
+    if not os.path.isdir(path):
+        return {}
+    snapshot = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                for name, stat in dir_snapshot(entry.path, extensions).items():
+                    snapshot[os.path.join(entry.name, name)] = stat
+            elif entry.is_file() and entry.name.lower().endswith(extensions):
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def file_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# 按修改时间轮询文件和目录，发生变化时在本线程中调用回调，耗时的重新加载不会阻塞视频循环
+class FileWatcher(threading.Thread):
+    def __init__(self, interval=2.0):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.watches = []  # [获取快照的函数, 回调, 上次快照]
+        self.stop_event = threading.Event()
+
+    def watch_dir(self, path, callback, extensions=(".jpg", ".png")):
+        snapshot = lambda: dir_snapshot(path, extensions)
+        self.watches.append([snapshot, callback, snapshot()])
+
+    def watch_file(self, path, callback):
+        snapshot = lambda: file_snapshot(path)
+        self.watches.append([snapshot, callback, snapshot()])
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            for watch in self.watches:
+                snapshot, callback, last = watch
+                current = snapshot()
+                if current == last:
+                    continue
+                watch[2] = current
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"重新加载失败: {e}")
+
+    def stop(self):
+        self.stop_event.set()
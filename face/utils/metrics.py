@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+
+# 各阶段耗时的滚动统计，每个阶段只保留最近 window 次的耗时
+class StageMetrics:
+    enabled = True
+
+    def __init__(self, window=300):
+        self.window = window
+        self.durations = {}  # 阶段名 -> deque(耗时秒数)
+        self.ticks = {}  # 计数器名 -> deque(时间戳)，用于计算帧率
+        self.gauges = {}  # 名称 -> 最新数值，例如队列长度
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        samples = self.durations.get(stage)
+        if samples is None:
+            with self.lock:
+                samples = self.durations.setdefault(stage, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def tick(self, name):
+        ticks = self.ticks.get(name)
+        if ticks is None:
+            with self.lock:
+                ticks = self.ticks.setdefault(name, deque(maxlen=self.window))
+        ticks.append(time.monotonic())
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self):
+        """返回 {"stages": {阶段: 统计}, "rates": {计数器: 每秒次数}, "gauges": {...}}"""
+        with self.lock:
+            durations = {stage: list(samples) for stage, samples in self.durations.items()}
+            ticks = {name: list(samples) for name, samples in self.ticks.items()}
+        stages = {}
+        for stage, samples in durations.items():
+            if not samples:
+                continue
+            values = np.array(samples) * 1000
+            stages[stage] = {
+                "count": len(values),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        rates = {}
+        for name, samples in ticks.items():
+            if len(samples) >= 2 and samples[-1] > samples[0]:
+                rates[name] = round((len(samples) - 1) / (samples[-1] - samples[0]), 2)
+        return {"stages": stages, "rates": rates, "gauges": dict(self.gauges)}
+
+    def format_overlay(self):
+        """叠加层显示的文本"""
+        snapshot = self.snapshot()
+        lines = [f"{name}: {rate:.1f} fps" for name, rate in snapshot["rates"].items()]
+        for stage, stats in snapshot["stages"].items():
+            lines.append(f"{stage:<10} p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms")
+        lines += [f"{name}: {value}" for name, value in snapshot["gauges"].items()]
+        return "\n".join(lines)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# 关闭统计时使用的空实现，所有方法都不做任何事
+class NullMetrics:
+    enabled = False
+    _timer = _NullTimer()
+
+    def record(self, stage, seconds):
+        pass
+
+    def timer(self, stage):
+        return self._timer
+
+    def tick(self, name):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+    def snapshot(self):
+        return {"stages": {}, "rates": {}, "gauges": {}}
+
+    def format_overlay(self):
+        return ""
+
+
+NULL_METRICS = NullMetrics()
+
+
+# 定期把统计快照追加写入本地 JSONL 文件
+class MetricsDumper(threading.Thread):
+    def __init__(self, metrics, path, interval=10):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        record = {"time": datetime.now().isoformat(timespec="seconds"), **self.metrics.snapshot()}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def stop(self):
+        self.stop_event.set()
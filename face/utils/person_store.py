@@ -0,0 +1,154 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+# information.txt 每行的字段顺序
+FIELDS = ["name", "gender", "student_id", "college", "person_type", "enrollment_time"]
+
+
+def read_info_file(path):
+    """读取逗号分隔的人员信息文件，逐行产生字段字典，字段数不对的行跳过"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            data = line.strip().split(",")
+            if len(data) == len(FIELDS):  # 确保每行有6个数据项
+                yield dict(zip(FIELDS, data))
+
+
+def format_info(info):
+    """界面上显示的人员信息文本（不含进入时间）"""
+    return f"姓名: {info['name']}\n\n" \
+           f"性别: {info['gender']}\n\n" \
+           f"学号: {info['student_id']}\n\n" \
+           f"所属学院: {info['college']}\n\n" \
+           f"人员类型: {info['person_type']}\n\n" \
+           f"入学时间: {info['enrollment_time']}"
+
+
+# 人员信息库：SQLite 文件按姓名（主键）和学号建索引，识别到某人时才查询该人，
+# 格式化好的信息文本放在 LRU 缓存中；可以从 information.txt 批量导入
+class PersonStore:
+    def __init__(self, db_path, known_faces_dir=None, cache_size=256):
+        self.db_path = db_path
+        self.known_faces_dir = known_faces_dir  # 用于查找人员照片
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # 姓名 -> 人员信息字典（含格式化文本），None 表示查无此人
+        self.lock = threading.Lock()  # 显示线程查询、监视线程导入共用一个连接
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS persons (
+                    name TEXT PRIMARY KEY,
+                    gender TEXT,
+                    student_id TEXT,
+                    college TEXT,
+                    person_type TEXT,
+                    enrollment_time TEXT
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_persons_student_id ON persons (student_id)")
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM persons").fetchone()[0]
+
+    def import_file(self, path, replace=True):
+        """
+        从逗号分隔的人员信息文件批量导入，在一个事务中完成，返回导入的人数。
+        replace 为 True 时文件内容即为全部人员，文件中没有的人会被删除
+        """
+        rows = [tuple(info[field] for field in FIELDS) for info in read_info_file(path)]
+        with self.lock, self.connection:
+            if replace:
+                self.connection.execute("DELETE FROM persons")
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO persons ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", rows)
+            self.cache.clear()
+        return len(rows)
+
+    def _row_to_info(self, row):
+        info = dict(zip(FIELDS, row))
+        info["image_path"] = self.image_path(info["name"])
+        info["text"] = format_info(info)
+        return info
+
+    def get(self, name):
+        """按姓名查询人员信息，返回字典（含 image_path 和格式化文本 text），查无此人返回 None"""
+        with self.lock:
+            if name in self.cache:
+                self.cache.move_to_end(name)
+                return self.cache[name]
+            row = self.connection.execute(f"SELECT {', '.join(FIELDS)} FROM persons WHERE name = ?",
+                                          (name,)).fetchone()
+            info = self._row_to_info(row) if row else None
+            self.cache[name] = info
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return info
+
+    def find_by_student_id(self, student_id):
+        with self.lock:
+            row = self.connection.execute(f"SELECT {', '.join(FIELDS)} FROM persons WHERE student_id = ?",
+                                          (student_id,)).fetchone()
+        return self._row_to_info(row) if row else None
+
+    def image_path(self, name):
+        """人员照片：known_faces 下的 {姓名}.jpg，或 {姓名}/ 目录中的第一张图片；没有时返回 None"""
+        if not self.known_faces_dir:
+            return None
+        for extension in (".jpg", ".png"):
+            path = os.path.join(self.known_faces_dir, name + extension)
+            if os.path.exists(path):
+                return path
+        folder = os.path.join(self.known_faces_dir, name)
+        if os.path.isdir(folder):
+            images = sorted(f for f in os.listdir(folder) if f.lower().endswith((".jpg", ".png")))
+            if images:
+                return os.path.join(folder, images[0])
+        return None
+
+    def modified_time(self):
+        """库最近一次写入的时间：WAL 模式下写入先落在 -wal 文件，检查点之前主库文件的时间不变，取两者较新的"""
+        times = [os.path.getmtime(path) for path in (self.db_path, self.db_path + "-wal") if os.path.exists(path)]
+        return max(times, default=0.0)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="人员信息库：从逗号分隔的文件导入，或按姓名/学号查询")
+    parser.add_argument("--db", default=config.PERSON_DB_PATH, help="人员信息库文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="批量导入（姓名,性别,学号,学院,人员类型,入学时间）")
+    import_parser.add_argument("files", nargs="+")
+    import_parser.add_argument("--append", action="store_true", help="保留库中已有的人员，只新增或更新")
+    lookup_parser = subparsers.add_parser("lookup", help="查询人员")
+    lookup_parser.add_argument("--name")
+    lookup_parser.add_argument("--student-id")
+    args = parser.parse_args(argv)
+
+    store = PersonStore(args.db, config.KNOWN_FACES_DIR)
+    if args.command == "import":
+        for i, path in enumerate(args.files):
+            # 多个文件时只有第一个文件会清空旧数据
+            count = store.import_file(path, replace=not args.append and i == 0)
+            print(f"{path}: 导入 {count} 人")
+        print(f"人员信息库共 {len(store)} 人")
+    else:
+        info = store.get(args.name) if args.name else store.find_by_student_id(args.student_id)
+        print(info["text"] if info else "查无此人")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
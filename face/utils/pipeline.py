@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+import cv2
+from utils.frame_pool import FramePool
+from utils.metrics import NULL_METRICS
+
+BUFFER_WAIT = 0.005  # 缓冲区全部在使用中时，采集线程等待释放的最长时间（秒）
+
+
+# 容量有限的队列，满时丢弃最旧的元素，保证消费者拿到的总是最新数据
+class LatestQueue:
+    def __init__(self, maxsize=1, on_drop=None, ready_event=None):
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.on_drop = on_drop  # 元素被挤掉时的回调，例如释放帧缓冲区
+        self.ready_event = ready_event  # 多个队列共用的事件，任一队列有新数据时置位，供消费者同时等待多个队列
+        self.dropped = 0  # 被新数据挤掉的数量
+
+    def put(self, item):
+        dropped = None
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+                dropped = self.items[0]
+            self.items.append(item)
+            self.condition.notify()
+        if self.ready_event is not None:
+            self.ready_event.set()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        """取出最旧的一项，超时返回 None"""
+        with self.condition:
+            if not self.items:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def get_nowait(self):
+        with self.condition:
+            return self.items.popleft() if self.items else None
+
+    def qsize(self):
+        with self.condition:
+            return len(self.items)
+
+
+# 采集线程：不停读取摄像头，只保留最新的帧，避免驱动缓冲区积压造成延迟
+# 帧直接读入预先分配的缓冲区并就地转换为 RGB，推理和显示都直接使用，不再各自转换；
+# 每个下游阶段各持有一次引用，用完后释放
+class CaptureWorker(threading.Thread):
+    def __init__(self, cap, outputs, metrics=NULL_METRICS, pool_size=6, name="capture", frame_interval=0):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.outputs = outputs  # 每个下游阶段一个 LatestQueue
+        self.metrics = metrics
+        self.pool_size = pool_size
+        self.name = name  # 统计中的计数器名，多路视频时区分各路
+        self.frame_interval = frame_interval  # 读取视频文件时按原帧率放慢读取，摄像头为 0
+        self.next_frame_time = 0.0
+        self.frame_pool = None  # 读到第一帧后按实际分辨率创建
+        self.running = True
+        self.frame_seq = 0
+
+    def run(self):
+        consumers = len(self.outputs)
+        while self.running:
+            buffer = self.frame_pool.acquire(consumers, timeout=BUFFER_WAIT) if self.frame_pool else None
+            if self.frame_pool and buffer is None:
+                # 下游占满了所有缓冲区：摄像头和网络流读走这一帧但不处理，保证下一帧是最新的；
+                # 视频文件不丢帧，继续等缓冲区释放
+                if not self.frame_interval:
+                    self.cap.grab()
+                continue
+
+            if self.frame_interval:
+                delay = self.next_frame_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.next_frame_time = max(self.next_frame_time, time.monotonic() - self.frame_interval) + self.frame_interval
+
+            with self.metrics.timer("capture"):
+                ret, frame = self.cap.read(buffer.array) if buffer else self.cap.read()
+            if not ret:
+                if buffer is not None:
+                    buffer.release(consumers)
+                time.sleep(0.01)
+                continue
+
+            if buffer is None or frame.ctypes.data != buffer.array.ctypes.data:
+                # 第一帧或分辨率变化：按实际尺寸重建缓冲池
+                if buffer is not None:
+                    buffer.release(consumers)
+                self.frame_pool = FramePool(frame.shape, self.pool_size)
+                buffer = self.frame_pool.acquire(consumers)
+                buffer.array[:] = frame
+            with self.metrics.timer("convert"):
+                cv2.cvtColor(buffer.array, cv2.COLOR_BGR2RGB, dst=buffer.array)
+
+            self.metrics.tick(self.name)
+            self.frame_seq += 1
+            packet = (self.frame_seq, time.monotonic(), buffer)
+            for queue in self.outputs:
+                queue.put(packet)
+
+    def stop(self):
+        self.running = False
+
+
+# 推理线程：取最新的帧做检测识别，结果放入结果队列，处理不过来的帧直接丢弃
+class InferenceWorker(threading.Thread):
+    def __init__(self, face_recognizer, frames, results, metrics=NULL_METRICS):
+        super().__init__(daemon=True)
+        self.face_recognizer = face_recognizer
+        self.metrics = metrics
+        self.frames = frames
+        self.results = results
+        self.running = True
+
+    def run(self):
+        while self.running:
+            packet = self.frames.get(timeout=0.1)
+            if packet is None:
+                continue
+            seq, timestamp, buffer = packet
+            with self.metrics.timer("inference"):
+                faces, recognized_name, recognized_image = self.face_recognizer.identify(buffer.array, rgb=True)
+            buffer.release()
+            self.metrics.tick("inference")
+            self.results.put((seq, timestamp, faces, recognized_name, recognized_image))
+
+    def stop(self):
+        self.running = False
+
+
+# 多路视频共用的推理线程：各路的最新帧轮流交给同一个识别引擎。
+# 每次从有新帧、且距上次推理已超过该路最小间隔（帧率上限）的视频源中，选最久没有被处理的一路，
+# 保证各路公平；处理不过来的帧在各路的队列中被更新的帧挤掉
+class SharedInferenceWorker(threading.Thread):
+    def __init__(self, sources, ready_event, metrics=NULL_METRICS):
+        super().__init__(daemon=True)
+        self.sources = sources  # CameraSource 列表，各有 recognizer / inference_queue / result_queue / min_interval
+        self.ready_event = ready_event  # 各路推理队列共用的新帧事件
+        self.metrics = metrics
+        self.running = True
+
+    def next_source(self):
+        now = time.monotonic()
+        ready = [source for source in self.sources
+                 if source.inference_queue.qsize() and now - source.last_started >= source.min_interval]
+        return min(ready, key=lambda source: source.last_started) if ready else None
+
+    def run(self):
+        while self.running:
+            source = self.next_source()
+            if source is None:
+                # 没有可处理的帧：等待新帧，或等到最早一路的帧率间隔结束
+                self.ready_event.wait(0.01)
+                self.ready_event.clear()
+                continue
+
+            packet = source.inference_queue.get_nowait()
+            if packet is None:
+                continue
+            source.last_started = time.monotonic()
+            seq, timestamp, buffer = packet
+            with self.metrics.timer("inference"):
+                faces, recognized_name, recognized_image = source.recognizer.identify(buffer.array, rgb=True)
+            buffer.release()
+            self.metrics.tick(source.inference_counter)
+            source.result_queue.put((seq, timestamp, faces, recognized_name, recognized_image))
+
+    def stop(self):
+        self.running = False
+
+
+# 多进程推理：同时把多帧交给识别进程池，结果按帧序号返回，比已输出结果更旧的直接丢弃
+class PoolInferenceWorker(threading.Thread):
+    def __init__(self, pool, frames, results, max_in_flight=None, metrics=NULL_METRICS):
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.metrics = metrics
+        self.frames = frames
+        self.results = results
+        self.max_in_flight = max_in_flight or pool.num_workers  # 同时在处理中的帧数上限
+        self.running = True
+        self.last_seq = 0  # 已输出结果的最大帧序号
+        self.stale = 0  # 因过期被丢弃的结果数量
+
+    def run(self):
+        pending = set()
+        while self.running:
+            # 有空闲进程时提交最新的帧
+            if len(pending) < self.max_in_flight:
+                packet = self.frames.get(timeout=0.005 if pending else 0.1)
+                if packet is not None:
+                    seq, timestamp, buffer = packet
+                    future = self.submit(seq, timestamp, buffer.array)
+                    if future is None:
+                        buffer.release()
+                    else:
+                        # 帧在后台线程中序列化发给子进程，完成后才能释放缓冲区
+                        future.add_done_callback(lambda f, buffer=buffer: buffer.release())
+                        pending.add(future)
+
+            if not pending:
+                continue
+
+            timeout = 0 if len(pending) < self.max_in_flight else 0.1
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            finished = []
+            for future in done:
+                try:
+                    finished.append(future.result())
+                except Exception as e:
+                    print(f"识别进程出错: {e}")
+
+            for result in sorted(finished, key=lambda r: r[0]):
+                if result[0] <= self.last_seq:
+                    self.stale += 1
+                    continue
+                self.last_seq = result[0]
+                # 进程池模式下只统计从采集到拿到结果的总延迟
+                self.metrics.record("inference", time.monotonic() - result[1])
+                self.metrics.tick("inference")
+                self.results.put(result)
+
+    def submit(self, seq, timestamp, frame):
+        # 人脸库热更新时会换一个新的进程池并关闭旧的，向已关闭的进程池提交失败时改用新的进程池；
+        # 进程池没有被替换（已经在退出）时返回 None，丢弃这一帧
+        while True:
+            pool = self.pool
+            try:
+                return pool.submit(seq, timestamp, frame)
+            except RuntimeError:
+                if self.pool is pool:
+                    return None
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# 尽早导入本模块（main.py 第一行），以此作为启动计时的起点
+PROCESS_START = time.perf_counter()
+
+
+# 启动过程计时：记录各个时间点（距启动的毫秒数）和各步骤耗时，启动完成后输出报告并与目标对比
+class StartupProfiler:
+    def __init__(self, start=PROCESS_START):
+        self.start = start
+        self.marks = {}  # 名称 -> 距启动的毫秒数，同名只记录第一次
+        self.spans = []  # (名称, 开始时距启动的毫秒数, 耗时毫秒)
+        self.reported = False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def mark(self, name):
+        """记录一个时间点，返回 True 表示第一次记录"""
+        if name in self.marks:
+            return False
+        self.marks[name] = self.elapsed_ms()
+        return True
+
+    @contextmanager
+    def span(self, name):
+        begin = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            self.spans.append((name, begin, self.elapsed_ms() - begin))
+
+    def has(self, *names):
+        return all(name in self.marks for name in names)
+
+    def report(self, target_ms=None, target_mark="first_frame"):
+        """启动报告：按时间排列的时间点和步骤耗时，以及 target_mark 是否在 target_ms 以内"""
+        events = [(at, f"{name}", None) for name, at in self.marks.items()]
+        events += [(begin, name, duration) for name, begin, duration in self.spans]
+        lines = ["启动耗时报告（距进程启动）:"]
+        for at, name, duration in sorted(events, key=lambda event: event[0]):
+            if duration is None:
+                lines.append(f"  {at:8.0f} ms  {name}")
+            else:
+                lines.append(f"  {at:8.0f} ms  {name}（耗时 {duration:.0f} ms）")
+        if target_ms is not None and target_mark in self.marks:
+            actual = self.marks[target_mark]
+            verdict = "达标" if actual <= target_ms else "超出目标"
+            lines.append(f"冷启动目标: {target_mark} <= {target_ms} ms，实际 {actual:.0f} ms，{verdict}")
+        return "\n".join(lines)
+
+    def save(self, path, target_ms=None, target_mark="first_frame"):
+        """把本次启动的计时追加写入 JSONL 文件，便于对比多次启动"""
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "marks": {name: round(at, 1) for name, at in self.marks.items()},
+            "spans": [{"name": name, "start_ms": round(begin, 1), "duration_ms": round(duration, 1)}
+                      for name, begin, duration in self.spans],
+            "target_ms": target_ms,
+            "target_mark": target_mark,
+        }
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# 进程内共用的启动计时器
+STARTUP = StartupProfiler()
@@ -1,79 +1,307 @@
 import cv2
 import numpy as np
 import os
-import face_recognition
+import threading
+import time
 from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer
 from PyQt5.QtWidgets import QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QWidget
 from PyQt5.QtGui import QImage, QPixmap
 from datetime import datetime
-from detection.face_detector import FaceRecognizer
+from detection.face_detector import UNKNOWN_FACE_IMAGE, FaceRecognizer
+from utils.pipeline import LatestQueue, CaptureWorker, PoolInferenceWorker, SharedInferenceWorker
+from utils.frame_pool import FramePool, release_packet
+from utils.metrics import NULL_METRICS, StageMetrics, MetricsDumper
+from utils.hot_reload import FileWatcher
+from utils.access_log import create_access_log
+from utils.person_store import PersonStore
+from utils.startup import STARTUP
+import config
+
+def open_capture(source):
+    """打开一路视频源：摄像头编号、网络流地址或视频文件"""
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 900)  # 设置宽度
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 500)  # 设置高度
+        cap.set(cv2.CAP_PROP_FPS, 30)  # 设置帧率
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 驱动只缓存一帧，减少画面延迟
+    return cap
+
+
+# 一路视频源：自己的采集线程和队列，识别器与其他各路共用人脸库
+class CameraSource:
+    def __init__(self, index, settings, face_recognizer, display_event, inference_event, metrics, pool_size):
+        if not isinstance(settings, dict):
+            settings = {"source": settings}
+        self.index = index
+        self.source = settings["source"]
+        self.name = str(settings.get("name", index))  # 用于到访记录和统计，默认为序号
+        fps = settings.get("fps", config.CAMERA_FPS_TARGET)
+        self.min_interval = 1.0 / fps if fps else 0.0  # 两次识别之间的最小间隔
+        self.last_started = 0.0  # 上次开始识别的时间，用于在各路之间轮转
+        self.cap = open_capture(self.source)
+
+        # 视频文件按原帧率读取，摄像头和网络流有多快读多快
+        frame_interval = 0
+        if isinstance(self.source, str) and os.path.isfile(self.source):
+            file_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = 1.0 / file_fps if file_fps > 0 else 0
+        suffix = "" if index == 0 else f":{self.name}"
+        self.inference_counter = "inference" + suffix
+
+        self.recognizer = face_recognizer if index == 0 else face_recognizer.for_source()
+        self.display_queue = LatestQueue(maxsize=1, on_drop=release_packet, ready_event=display_event)
+        self.inference_queue = LatestQueue(maxsize=1, on_drop=release_packet, ready_event=inference_event)
+        self.result_queue = LatestQueue(maxsize=1)
+        self.capture_worker = CaptureWorker(self.cap, [self.display_queue, self.inference_queue], metrics,
+                                            pool_size=pool_size, name="capture" + suffix,
+                                            frame_interval=frame_interval)
+        self.display_pool = None  # 显示用的 RGB 缓冲池，界面线程转换成 QPixmap 后归还
+        self.latest_faces = []  # 最近一次的识别结果，叠加到每一帧画面上
+
 
 class VideoCaptureThread(QThread):
-    change_pixmap_signal = pyqtSignal(QImage)
+    change_pixmap_signal = pyqtSignal(int, QImage, object)  # (视频源序号, 画面, 画面所在的帧缓冲区，界面用完后释放)
     face_frame_signal = pyqtSignal(QImage)
+    faces_signal = pyqtSignal(int, list)  # 每次识别完成后发送 (视频源序号, 该画面中全部人脸的 FaceResult 列表)
+    gallery_progress_signal = pyqtSignal(int, int)  # 人脸库加载进度 (已处理人数, 总人数)，已加载的部分已经生效
+    gallery_ready_signal = pyqtSignal(int)  # 人脸库加载完成且识别已全部就绪，参数为人脸库大小
+    gallery_reloaded_signal = pyqtSignal(int)  # 热更新后新的人脸库已生效，参数为人脸库大小
 
     def __init__(self):
+        # 构造函数在界面线程中执行，只做轻量的初始化；打开摄像头在 run 中，加载人脸库在单独的后台线程中
         super().__init__()
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 900)  # 设置宽度
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 500)  # 设置高度
-        self.cap.set(cv2.CAP_PROP_FPS, 30)  # 设置帧率
-        self.face_recognizer = FaceRecognizer(tolerance=0.45)  # 调整tolerance提高准确性
+        # 各阶段耗时统计，关闭时使用空实现
+        self.metrics = StageMetrics(config.METRICS_WINDOW) if config.METRICS_ENABLED else NULL_METRICS
+        self.metrics_dumper = None
+        if config.METRICS_ENABLED and config.METRICS_DUMP_PATH:
+            self.metrics_dumper = MetricsDumper(self.metrics, config.METRICS_DUMP_PATH, config.METRICS_DUMP_INTERVAL)
+        self.face_recognizer = FaceRecognizer(known_faces_dir=config.KNOWN_FACES_DIR,
+                                              tolerance=config.TOLERANCE,  # 调整tolerance提高准确性
+                                              matcher=config.MATCHER_BACKEND,
+                                              matcher_params=config.MATCHER_PARAMS.get(config.MATCHER_BACKEND),
+                                              index_path=config.MATCHER_INDEX_PATH,
+                                              detector=config.DETECTOR_BACKEND,
+                                              detector_params=config.DETECTOR_PARAMS.get(config.DETECTOR_BACKEND),
+                                              detection_scale=config.DETECTION_SCALE,
+                                              latency_budget_ms=config.DETECTION_LATENCY_BUDGET_MS,
+                                              tracking=config.TRACKING,
+                                              enrollment=config.ENROLLMENT,
+                                              motion_gate=config.MOTION_GATE if config.RECOGNITION_WORKERS == 0 else None,
+                                              encoding_memo=config.ENCODING_MEMO,
+                                              metrics=self.metrics,
+                                              defer_load=True)
+        self.gallery_loader = threading.Thread(target=self.load_gallery, daemon=True)
         self.running = True
         self.last_recognized_name = None  # 用于跟踪上次识别到的人脸
-        self.info_data = {}  # 用于存储从txt文件读取的人员信息
+        self.panel_source = None  # 右侧人员信息面板当前显示的是哪一路视频识别到的人
+        self.info_path = config.INFO_PATH
+        self.person_store = None  # 人员信息库，在人脸库加载线程中打开
         self.is_info_updated = False  # 用于标记信息是否已更新
         self.unknown_face_shown = False  # 用于标记是否已显示未知人脸
 
+        # 每路视频：采集 / 推理 / 显示三级流水线，各阶段之间用"最新优先"的有界队列连接
+        # 帧保存在预先分配的缓冲池中，被挤掉的帧释放回池中复用；所有视频源共用一个识别引擎和人脸库
+        self.display_event = threading.Event()
+        self.inference_event = threading.Event()
+        self.sources = []  # CameraSource 列表，在 run 中打开
+        self.inference_workers = []
+        self.recognition_pool = None
+        self.access_log = None
+
+        self.file_watcher = None  # 热更新监视，人脸库首次加载完成后在加载线程中创建
+
     def run(self):
+        # 先开始加载人脸库，打开摄像头的同时就在编码
+        self.gallery_loader.start()
+        with STARTUP.span("open_cameras"):
+            self.sources = [CameraSource(i, settings, self.face_recognizer, self.display_event, self.inference_event,
+                                         self.metrics, pool_size=4 + config.RECOGNITION_WORKERS)
+                            for i, settings in enumerate(config.CAMERA_SOURCES)]
+        if config.RECOGNITION_WORKERS == 0:
+            # 人脸库边加载边生效，推理线程立即启动；多进程识别要等人脸库加载完才能建进程池
+            self.inference_workers = [SharedInferenceWorker(self.sources, self.inference_event, self.metrics)]
+        # 到访记录：同一人连续出现合并为一条，由后台线程批量写入
+        self.access_log = create_access_log(config.ACCESS_LOG, camera=self.sources[0].name)
+
+        for source in self.sources:
+            source.capture_worker.start()
+        if config.RECOGNITION_WORKERS == 0:
+            # 多进程识别的推理线程由人脸库加载线程创建并启动
+            for worker in self.inference_workers:
+                worker.start()
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.start()
+        if self.access_log is not None:
+            self.access_log.writer.start()
+
+        # 显示阶段：按摄像头帧率刷新各路画面，叠加最近一次的识别结果，不等待推理
         while self.running:
-            ret, frame = self.cap.read()
-            if ret:
-                # 识别人脸并在帧中标记
-                frame_with_faces, recognized_name, recognized_image = self.face_recognizer.recognize_faces(frame.copy())
-                rgb_frame = cv2.cvtColor(frame_with_faces, cv2.COLOR_BGR2RGB)
-
-                h, w, ch = rgb_frame.shape
-                bytes_per_line = ch * w
-                q_img = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                self.change_pixmap_signal.emit(q_img)
-
-                if recognized_name:
-                    # 如果识别到人脸，发送该人脸的框架
-                    face_frame = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                    self.face_frame_signal.emit(face_frame)
-                    self.face_recognizer.recognized_image = recognized_image  # 保存已知人脸图像路径
-                    self.face_recognizer.recognized_name = recognized_name
-
-                    if self.last_recognized_name != recognized_name:
-                        self.last_recognized_name = recognized_name  # 更新最后识别到的人脸
-                        self.emit_new_face()  # 如果换了人脸，发出新的人脸信号
-                        self.is_info_updated = False  # 标记信息未更新
-
-                    # 如果人脸没有变化，且信息尚未更新，更新信息
-                    if not self.is_info_updated:
-                        self.update_info_text(recognized_name)
-                        self.is_info_updated = True  # 更新标志为已更新
-                else:
-                    # 没有识别到人脸时清空信息和头像
-                    self.clear_info_and_image()
-
-    def emit_new_face(self):
-        # 发送新的人脸图像
-        self.face_frame_signal.emit(QImage(self.face_recognizer.recognized_image))
+            if not self.display_event.wait(0.1):
+                continue
+            # 先清除事件再取帧，取帧期间到达的新帧会重新置位，不会漏掉
+            self.display_event.clear()
+            for source in self.sources:
+                packet = source.display_queue.get_nowait()
+                if packet is not None:
+                    self.display_frame(source, packet)
+        self.shutdown()
+
+    def load_gallery(self):
+        # 在后台线程中加载人脸库，已编码的部分每隔一段时间生效一次，界面显示加载进度
+        # 人员信息库的打开和导入也在这里进行，不占用界面线程
+        with STARTUP.span("open_person_store"):
+            self.open_person_store()
+        with STARTUP.span("load_gallery"):
+            gallery = self.face_recognizer.load_progressively(self.gallery_progress_signal.emit)
+        if config.RECOGNITION_WORKERS > 0 and self.running:
+            # 多进程识别，子进程通过共享内存使用同一份人脸库；各路平分同时处理中的帧数
+            from detection.worker_pool import RecognitionPool
+            self.recognition_pool = RecognitionPool(self.face_recognizer, config.RECOGNITION_WORKERS)
+            max_in_flight = max(1, config.RECOGNITION_WORKERS // len(config.CAMERA_SOURCES))
+            while self.running and len(self.sources) < len(config.CAMERA_SOURCES):
+                time.sleep(0.05)  # 等 run 打开全部摄像头
+            workers = [PoolInferenceWorker(self.recognition_pool, source.inference_queue, source.result_queue,
+                                           max_in_flight, self.metrics)
+                       for source in self.sources]
+            for worker in workers:
+                worker.start()
+            self.inference_workers = workers
+        print(f"人脸库加载完成，共 {len(gallery)} 人。")
+        self.gallery_ready_signal.emit(len(gallery))
+        if config.HOT_RELOAD_INTERVAL and self.running:
+            # 监视已知人脸目录和人员信息文件，有变化时在后台重新加载；登记时会对目录做一次快照
+            file_watcher = FileWatcher(config.HOT_RELOAD_INTERVAL)
+            file_watcher.watch_dir(self.face_recognizer.known_faces_dir, self.on_known_faces_changed)
+            file_watcher.watch_file(self.info_path, self.on_info_changed)
+            self.file_watcher = file_watcher
+            file_watcher.start()
+
+    def open_person_store(self):
+        # 人员信息库，识别到某人时才按姓名查询；信息文件比库新时重新导入
+        person_store = PersonStore(config.PERSON_DB_PATH, config.KNOWN_FACES_DIR, config.PERSON_CACHE_SIZE)
+        if os.path.exists(self.info_path) and (len(person_store) == 0
+                                               or os.path.getmtime(self.info_path) > person_store.modified_time()):
+            count = person_store.import_file(self.info_path)
+            print(f"人员信息已导入，共 {count} 人。")
+        self.person_store = person_store
+        self.is_info_updated = False  # 打开之前显示的人员只有姓名，重新生成信息
+
+    def display_frame(self, source, packet):
+        seq, timestamp, buffer = packet
+        frame = buffer.array
+
+        result = source.result_queue.get_nowait()
+        face_frame = None
+        if result is not None:
+            _, _, source.latest_faces, recognized_name, recognized_image = result
+            self.faces_signal.emit(source.index, list(source.latest_faces))
+            if self.access_log is not None:
+                self.access_log.observe(source.latest_faces, frame, camera=source.name)
+            if recognized_name:
+                face_frame = self.face_crop_image(frame, source.latest_faces)
+
+        if source.display_pool is None or source.display_pool.shape != frame.shape:
+            source.display_pool = FramePool(frame.shape, count=3)
+        rgb_buffer = source.display_pool.acquire()
+        if rgb_buffer is None:
+            # 界面线程还没处理完之前的画面，丢弃这一帧
+            buffer.release()
+        else:
+            # 采集时已转换为 RGB，复制到显示缓冲区后在副本上标记，不影响仍在识别的原帧
+            with self.metrics.timer("copy"):
+                rgb_frame = rgb_buffer.array
+                np.copyto(rgb_frame, frame)
+            buffer.release()
+            with self.metrics.timer("draw"):
+                self.face_recognizer.draw_faces(rgb_frame, source.latest_faces)
+
+            h, w, ch = rgb_frame.shape
+            bytes_per_line = ch * w
+            q_img = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
+            # QImage 不拥有内存，缓冲区随信号一起交给界面线程，由界面线程释放
+            self.change_pixmap_signal.emit(source.index, q_img, rgb_buffer)
+
+        if self.metrics.enabled and source.index == 0:
+            self.metrics.tick("display")
+            self.metrics.set_gauge("inference_queue", source.inference_queue.qsize())
+            self.metrics.set_gauge("dropped_frames", sum(s.inference_queue.dropped for s in self.sources))
+            self.metrics.set_gauge("display_buffers_in_use", source.display_pool.in_use())
+
+        if result is not None:
+            # 多路视频时，某一路没有人脸只清空由这一路显示的人员信息
+            if recognized_name or self.panel_source in (None, source.index):
+                self.panel_source = source.index if recognized_name else None
+                self.handle_recognition(recognized_name, recognized_image, face_frame)
+
+    @staticmethod
+    def face_crop_image(frame, faces):
+        # 截取最后一张人脸区域（帧已是 RGB），复制为连续内存，不依赖会被复用的帧缓冲区
+        top, right, bottom, left = faces[-1].box if faces else (0, 1, 1, 0)
+        crop = np.ascontiguousarray(frame[top:max(bottom, top + 1), left:max(right, left + 1)])
+        h, w, ch = crop.shape
+        return QImage(crop.data, w, h, ch * w, QImage.Format_RGB888).copy()
+
+    def handle_recognition(self, recognized_name, recognized_image, face_frame):
+        if recognized_name:
+            # 如果识别到人脸，发送该人脸的框架
+            self.face_frame_signal.emit(face_frame)
+            self.face_recognizer.recognized_image = recognized_image  # 保存已知人脸图像路径
+            self.face_recognizer.recognized_name = recognized_name
+
+            if self.last_recognized_name != recognized_name:
+                self.last_recognized_name = recognized_name  # 更新最后识别到的人脸
+                self.emit_new_face(face_frame)  # 如果换了人脸，发出新的人脸信号
+                self.is_info_updated = False  # 标记信息未更新
+
+            # 如果人脸没有变化，且信息尚未更新，更新信息
+            if not self.is_info_updated:
+                self.update_info_text(recognized_name)
+                self.is_info_updated = True  # 更新标志为已更新
+        else:
+            # 没有识别到人脸时清空信息和头像
+            self.clear_info_and_image()
+
+    def emit_new_face(self, face_frame):
+        # 发送新的人脸图像；头像由界面线程从缩略图缓存中取，这里不再解码原图
+        self.face_frame_signal.emit(face_frame)
 
     def stop(self):
+        # 显示循环退出后在本线程中释放资源，调用方随后 wait() 等待线程结束
         self.running = False
-        self.cap.release()
+
+    def shutdown(self):
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        # 先停止采集和推理线程，再释放摄像头，避免释放时仍在读取
+        for worker in [source.capture_worker for source in self.sources] + self.inference_workers:
+            worker.stop()
+            if worker.is_alive():
+                worker.join()
+        if self.metrics_dumper is not None and self.metrics_dumper.is_alive():
+            self.metrics_dumper.stop()
+            self.metrics_dumper.dump()  # 退出前写入最后一次统计
+        if self.recognition_pool is not None:
+            self.recognition_pool.close()
+        if self.access_log is not None:
+            self.access_log.close()  # 结束进行中的到访并写完剩余记录
+        if self.person_store is not None:
+            self.person_store.close()
+        for source in self.sources:
+            source.cap.release()
+            gate = source.recognizer.motion_gate
+            if gate is not None:
+                print(f"{source.name} 运动门控: 跳过检测 {gate.skipped} 次，执行检测 {gate.ran} 次，"
+                      f"跳过比例 {gate.skip_ratio:.1%}")
+            memo = source.recognizer.encoding_memo
+            if memo is not None:
+                print(f"{source.name} 编码备忘: 命中 {memo.hits} 次，未命中 {memo.misses} 次，命中率 {memo.hit_rate:.1%}，"
+                      f"约节省 {memo.saved_seconds:.1f} 秒")
 
     def update_info_text(self, recognized_name):
         # 获取当前时间
         current_time = datetime.now().strftime("%Y-%m-%d")
 
-        # 从txt文件读取信息
-        if not self.info_data:
-            self.load_info_data()
-
         # 获取该人脸的详细信息
         if recognized_name == "unknow":
             # 如果未匹配到已知人脸，更新为未知信息
@@ -84,41 +312,44 @@ class VideoCaptureThread(QThread):
                            f"人员类型: 未知\n\n" \
                            f"入学时间: 未知\n\n" \
                            f"进入时间: {current_time}"
-             # 默认未知人脸图像
-            self.face_recognizer.recognized_image = r"face\unknow_face\unknow_face.png" 
-            
-        elif recognized_name in self.info_data:
-            info = self.info_data[recognized_name]
-            # 更新信息文本
-            updated_info = f"姓名: {info['name']}\n\n" \
-                           f"性别: {info['gender']}\n\n" \
-                           f"学号: {info['student_id']}\n\n" \
-                           f"所属学院: {info['college']}\n\n" \
-                           f"人员类型: {info['person_type']}\n\n" \
-                           f"入学时间: {info['enrollment_time']}\n\n" \
-                           f"进入时间: {current_time}"
-            self.face_recognizer.recognized_image = info['image_path']
+            # 默认未知人脸图像
+            self.face_recognizer.recognized_image = UNKNOWN_FACE_IMAGE
+        else:
+            # 只查询识别到的这个人，格式化好的文本由人员信息库缓存
+            info = self.person_store.get(recognized_name) if self.person_store is not None else None
+            if info is not None:
+                updated_info = f"{info['text']}\n\n进入时间: {current_time}"
+                if info["image_path"]:
+                    self.face_recognizer.recognized_image = info["image_path"]
+            else:
+                updated_info = f"姓名: {recognized_name}\n\n进入时间: {current_time}"
 
         self.face_recognizer.recognized_info = updated_info
 
+    def on_known_faces_changed(self):
+        # 在监视线程中执行：只编码新增或变化的图片，建好新人脸库后整体替换
+        gallery = self.face_recognizer.reload_known_faces()
+        print(f"人脸库已更新，共 {len(gallery)} 人。")
+        self.gallery_reloaded_signal.emit(len(gallery))
+        if self.recognition_pool is not None:
+            # 识别子进程中的人脸库是创建时的快照，换一个新的进程池
+            from detection.worker_pool import RecognitionPool
+            old_pool = self.recognition_pool
+            self.recognition_pool = RecognitionPool(self.face_recognizer, config.RECOGNITION_WORKERS)
+            for worker in self.inference_workers:
+                worker.pool = self.recognition_pool
+            old_pool.close()
+        self.is_info_updated = False  # 当前显示的人员可能已被删除，重新生成信息
+
+    def on_info_changed(self):
+        self.load_info_data()
+        self.is_info_updated = False
+
     def load_info_data(self):
-        # 从文件中读取已知人员信息
-        txt_path = r"C:\Users\baby\Desktop\大实验\face\information\information.txt"
-        if os.path.exists(txt_path):
-            with open(txt_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    data = line.strip().split(',')
-                    if len(data) == 6:  # 确保每行有6个数据项
-                        name, gender, student_id, college, person_type, enrollment_time = data
-                        self.info_data[name] = {
-                            "name": name,
-                            "gender": gender,
-                            "student_id": student_id,
-                            "college": college,
-                            "person_type": person_type,
-                            "enrollment_time": enrollment_time,
-                            "image_path": f"C:/Users/baby/Desktop/大实验/face/known_faces/{name}.jpg"
-                        }
+        # 把人员信息文件导入人员信息库，在一个事务中整体替换，热更新时不会读到一半的数据
+        if self.person_store is not None and os.path.exists(self.info_path):
+            count = self.person_store.import_file(self.info_path)
+            print(f"人员信息已导入，共 {count} 人。")
 
     def clear_info_and_image(self):
         # 清除信息和头像